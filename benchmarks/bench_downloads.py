@@ -0,0 +1,88 @@
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+from bench_utils import add_common_arguments, finish, measure, measure_once
+
+DOWNLOADS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "clean_downloads")
+
+# Default extension mix: extension -> relative weight
+DEFAULT_MIX = {
+    ".pdf": 20, ".docx": 8, ".xlsx": 6, ".txt": 6, ".jpg": 15, ".png": 10, ".mp4": 4,
+    ".zip": 6, ".exe": 3, ".py": 4, ".json": 4, ".mp3": 3, ".bin": 5, "": 2,
+}
+
+
+def parse_mix(text):
+    """'.pdf=20,.jpg=10' -> {'.pdf': 20, '.jpg': 10}"""
+    mix = {}
+    for item in text.split(","):
+        ext, _, weight = item.partition("=")
+        mix[ext.strip()] = int(weight or 1)
+    return mix
+
+
+def create_download_tree(root, count, mix, size=0, seed=1234):
+    """Create count files in root with extensions drawn from mix; return the file names."""
+    rng = random.Random(seed)
+    extensions = list(mix)
+    weights = [mix[e] for e in extensions]
+    payload = b"x" * size
+    names = []
+    for i, ext in enumerate(rng.choices(extensions, weights, k=count)):
+        name = f"file_{i:07d}{ext}"
+        with open(os.path.join(root, name), "wb") as f:
+            f.write(payload)
+        names.append(name)
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the downloads organizer")
+    add_common_arguments(parser)
+    parser.add_argument("--sizes", default="1000,10000", help="comma-separated file counts")
+    parser.add_argument("--mix", help="extension mix, e.g. '.pdf=20,.jpg=10,=1' (default: realistic mix)")
+    parser.add_argument("--file-size", type=int, default=0, help="bytes written to every synthetic file")
+    parser.add_argument("--keep", action="store_true", help="keep the synthetic trees")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix) if args.mix else DEFAULT_MIX
+    root = tempfile.mkdtemp(prefix="downloads-bench-")
+    # clean_downloads reads the folder from the environment when imported
+    os.environ["DOWNLOAD_PATH"] = root
+    sys.path.insert(0, os.path.abspath(DOWNLOADS_DIR))
+    import clean_downloads
+
+    # Journals and caches go to the temp root, never to the user's ~/.cache
+    state = clean_downloads.Path(root, "state")
+    clean_downloads.JOURNAL_DIR = state / "journals"
+    clean_downloads.TYPE_CACHE_FILE = state / "types.json"
+    clean_downloads.HASH_CACHE_FILE = state / "hashes.json"
+
+    results = []
+    for count in [int(s) for s in args.sizes.split(",") if s]:
+        folder = os.path.join(root, f"tree_{count}")
+        os.makedirs(folder)
+        create_download_tree(folder, count, mix, size=args.file_size)
+        clean_downloads.DOWNLOADS_FOLDER = clean_downloads.Path(folder)
+
+        # Scan cost alone: a second organize over an already organized folder
+        results.append(measure_once("organize_files", clean_downloads.organize_files,
+                                    items=count, files=count, file_size=args.file_size))
+        results.append(measure("organize_files.rescan", clean_downloads.organize_files,
+                               repeat=max(1, args.repeat // 10), files=count))
+        if not args.keep:
+            shutil.rmtree(folder)
+
+    finish(results, args)
+    if args.keep:
+        print(f"Synthetic trees kept in {root}")
+    else:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from bench_utils import add_common_arguments, finish, install_fake_psutil, measure, measure_once
+
+HEALTH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "health_laptop")
+
+STATUSES = ["🔌 Cargando", "🔋 Desconectado"]
+
+# Seconds between synthetic samples
+SAMPLE_STEP = 5
+
+
+def synthetic_history(count, step=SAMPLE_STEP, end=None):
+    """Yield (timestamp, cpu, ram, disk, battery, status) samples ending now."""
+    end = end or time.time()
+    start = end - count * step
+    for i in range(count):
+        yield (
+            start + i * step,
+            float((i * 37) % 100),
+            float(40 + (i * 13) % 50),
+            55.0 + (i % 10) / 10,
+            100 - (i // 720) % 100,
+            STATUSES[(i // 1000) % 2],
+        )
+
+
+def write_legacy_history(path, count):
+    """Old-style health_history.json with count entries (for the migration benchmark)."""
+    entries = [
+        {"timestamp": datetime.fromtimestamp(ts).isoformat(), "cpu": cpu, "ram": ram,
+         "disk": disk, "battery": battery, "battery_status": status}
+        for ts, cpu, ram, disk, battery, status in synthetic_history(count)
+    ]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(entries, f, indent=2)
+
+
+def make_monitor(laptop_health_pro, capacity, retention_days=30):
+    with open("health_config.json", "w") as f:
+        json.dump({"history_capacity": capacity, "history_retention_days": retention_days,
+                   "notifications": False}, f)
+    monitor = laptop_health_pro.LaptopHealthMonitor(one_shot=True)
+    # Set per instance (__init__ sets it too): keep the --once cache out of the real temp dir
+    monitor.once_cache_file = os.path.abspath("once.json")
+    monitor.load_history()
+    return monitor
+
+
+def bench_collectors(laptop_health_pro, repeat, process_count):
+    from process_collector import ProcessCollector
+
+    monitor = make_monitor(laptop_health_pro, 1000)
+    collectors = {
+        "cpu": monitor.collect_cpu,
+        "ram": monitor.collect_ram,
+        "disk": monitor.collect_disk,
+        "battery": monitor.collect_battery,
+        "temperature": monitor.collect_temperature,
+        "network": monitor.collect_network_io,
+    }
+    results = [measure(f"collector.{name}", func, repeat=repeat) for name, func in collectors.items()]
+
+    processes = ProcessCollector(top_n=5)
+    results.append(measure("collector.processes", processes.collect, repeat=repeat,
+                           items=process_count, process_count=process_count))
+    results.append(measure("collect_once", monitor.collect_once, repeat=repeat))
+    return results
+
+
+def bench_get_system_stats(laptop_health_pro, repeat):
+    with open("health_config.json", "w") as f:
+        json.dump({"latency_targets": [], "notifications": False}, f)
+    monitor = laptop_health_pro.LaptopHealthMonitor()
+    monitor.start_sampling()
+    monitor.sampler.wait_ready(5)
+    try:
+        return [measure("get_system_stats", monitor.get_system_stats, repeat=repeat * 20)]
+    finally:
+        monitor.sampler.stop()
+        monitor.latency_prober.stop()
+        monitor.history_store.close()
+
+
+def bench_history(laptop_health_pro, sizes, repeat):
+    results = []
+    for size in sizes:
+        # Retention covers the whole synthetic span, or saving would trim it before timing
+        retention_days = math.ceil(size * SAMPLE_STEP / 86400) + 1
+        monitor = make_monitor(laptop_health_pro, size + repeat + 10, retention_days)
+        for sample in synthetic_history(size):
+            monitor.history.append(*sample)
+        stats = (42.0, 60.0, 55.0, 80, STATUSES[0], {}, {})
+        before = len(monitor.history)
+        monitor.save_to_history(stats)
+        assert before >= size and len(monitor.history) == before + 1, \
+            f"history trimmed to {len(monitor.history)} entries, expected {before + 1}"
+
+        results.append(measure("save_to_history", lambda: monitor.save_to_history(stats),
+                               repeat=repeat, history=size))
+
+        end = datetime.now()
+        results.append(measure("show_history.latest", lambda: monitor.history.latest(10),
+                               repeat=repeat, history=size))
+        results.append(measure("show_history.query_24h_p95",
+                               lambda: monitor.query("cpu", end - timedelta(hours=24), end, "p95", "15m"),
+                               repeat=repeat, history=size))
+        results.append(measure("query_7d_mean_rollup",
+                               lambda: monitor.query("ram", end - timedelta(days=7), end, "mean", "1h"),
+                               repeat=repeat, history=size))
+        monitor.history_store.close()
+    return results
+
+
+def bench_migration(laptop_health_pro, sizes):
+    results = []
+    for size in sizes:
+        workdir = tempfile.mkdtemp(prefix="migrate-")
+        os.chdir(workdir)
+        write_legacy_history("health_history.json", size)
+        with open("health_config.json", "w") as f:
+            json.dump({"history_capacity": size + 10}, f)
+        monitor = laptop_health_pro.LaptopHealthMonitor(one_shot=True)
+        results.append(measure_once("load_history.migrate", monitor.load_history, items=size, history=size))
+        monitor.history_store.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the laptop health monitor")
+    add_common_arguments(parser)
+    parser.add_argument("--sizes", default="10000,100000,1000000",
+                        help="comma-separated history sizes for save/show benchmarks")
+    parser.add_argument("--migration-sizes", default="10000,100000",
+                        help="comma-separated sizes for the legacy JSON migration benchmark")
+    parser.add_argument("--processes", type=int, default=2000, help="number of fake processes")
+    args = parser.parse_args()
+
+    install_fake_psutil(process_count=args.processes)
+    sys.path.insert(0, os.path.abspath(HEALTH_DIR))
+    import laptop_health_pro
+
+    workdir = tempfile.mkdtemp(prefix="health-bench-")
+    os.chdir(workdir)
+
+    results = []
+    results += bench_collectors(laptop_health_pro, args.repeat, args.processes)
+    results += bench_get_system_stats(laptop_health_pro, args.repeat)
+    results += bench_history(laptop_health_pro, [int(s) for s in args.sizes.split(",") if s], args.repeat)
+    results += bench_migration(laptop_health_pro,
+                               [int(s) for s in args.migration_sizes.split(",") if s])
+    finish(results, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+
+
+def percentile(sorted_values, p):
+    """Percentile with linear interpolation over already sorted values."""
+    if not sorted_values:
+        return None
+    pos = (len(sorted_values) - 1) * p / 100
+    low = int(pos)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (pos - low)
+
+
+def measure(name, func, repeat=50, items=1, setup=None, **params):
+    """Run func repeatedly and return latency percentiles, throughput and peak memory."""
+    if setup:
+        setup()
+    func()  # warm-up
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    # Memory is traced in a separate call so tracemalloc does not skew the timings
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    total = sum(timings)
+    return {
+        "name": name,
+        "params": params,
+        "repeat": repeat,
+        "items": items,
+        "mean_s": total / repeat,
+        "p50_s": percentile(timings, 50),
+        "p95_s": percentile(timings, 95),
+        "p99_s": percentile(timings, 99),
+        "max_s": timings[-1],
+        "throughput_per_s": items * repeat / total if total else None,
+        "peak_memory_bytes": peak,
+    }
+
+
+def measure_once(name, func, items=1, **params):
+    """Single run for operations that change state (e.g. moving files).
+
+    Memory is traced during the timed run, so the timing includes tracemalloc overhead.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "name": name,
+        "params": params,
+        "repeat": 1,
+        "items": items,
+        "mean_s": elapsed,
+        "p50_s": elapsed,
+        "p95_s": elapsed,
+        "p99_s": elapsed,
+        "max_s": elapsed,
+        "throughput_per_s": items / elapsed if elapsed else None,
+        "peak_memory_bytes": peak,
+    }
+
+
+def result_key(result):
+    params = ",".join(f"{k}={v}" for k, v in sorted(result["params"].items()))
+    return f"{result['name']}[{params}]"
+
+
+def write_results(results, path):
+    """Save results as JSON together with basic environment information."""
+    document = {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+
+
+def compare_results(results, baseline_path):
+    """Print the p50 change of every benchmark against a previous run."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {result_key(r): r for r in json.load(f)["results"]}
+    print(f"\nComparison against {baseline_path}:")
+    for result in results:
+        key = result_key(result)
+        old = baseline.get(key)
+        if old is None:
+            print(f"  {key}: new")
+            continue
+        change = (result["p50_s"] - old["p50_s"]) / old["p50_s"] * 100 if old["p50_s"] else 0
+        print(f"  {key}: {old['p50_s'] * 1000:.3f} ms -> {result['p50_s'] * 1000:.3f} ms ({change:+.1f}%)")
+
+
+def print_results(results):
+    for result in results:
+        print(f"{result_key(result):<60} p50 {result['p50_s'] * 1000:9.3f} ms  "
+              f"p99 {result['p99_s'] * 1000:9.3f} ms  "
+              f"{result['throughput_per_s'] or 0:12.1f}/s  "
+              f"peak {result['peak_memory_bytes'] / 1024:9.1f} KB")
+
+
+def add_common_arguments(parser):
+    parser.add_argument("--output", help="write machine-readable results to this JSON file")
+    parser.add_argument("--compare", help="compare against a previous results JSON file")
+    parser.add_argument("--repeat", type=int, default=50, help="iterations per benchmark")
+
+
+def finish(results, args):
+    print_results(results)
+    if args.output:
+        write_results(results, args.output)
+        print(f"\nResults written to {args.output}")
+    if args.compare:
+        compare_results(results, args.compare)
+
+
+# ---------------------
+# DETERMINISTIC PSUTIL
+# ---------------------
+
+def install_fake_psutil(process_count=300):
+    """Replace psutil with a deterministic stub so collector timings are repeatable."""
+    import types
+
+    fake = types.ModuleType("psutil")
+    memory = namedtuple("svmem", "percent")
+    disk = namedtuple("sdiskusage", "percent")
+    battery = namedtuple("sbattery", "percent power_plugged")
+    temp = namedtuple("shwtemp", "current")
+    net = namedtuple("snetio", "bytes_sent bytes_recv")
+    cpu_times = namedtuple("scputimes", "user nice system idle iowait")
+    mem_info = namedtuple("pmem", "rss")
+    io = namedtuple("pio", "read_bytes write_bytes")
+    counter = {"ticks": 0}
+
+    def tick():
+        counter["ticks"] += 1
+        return counter["ticks"]
+
+    class NoSuchProcess(Exception):
+        pass
+
+    class AccessDenied(Exception):
+        pass
+
+    class ZombieProcess(NoSuchProcess):
+        pass
+
+    class Process:
+        def __init__(self, pid=None):
+            self.pid = pid or 1
+
+        def oneshot(self):
+            import contextlib
+            return contextlib.nullcontext()
+
+        def name(self):
+            return f"process-{self.pid}"
+
+        def create_time(self):
+            return 1_000_000.0
+
+        def cpu_percent(self, interval=None):
+            return float((self.pid * 7 + counter["ticks"]) % 100)
+
+        def memory_info(self):
+            return mem_info(self.pid * 4096)
+
+        def io_counters(self):
+            return io(self.pid * tick(), self.pid)
+
+        def num_threads(self):
+            return 4
+
+    fake.cpu_percent = lambda interval=None: float(tick() % 100)
+    fake.cpu_times = lambda: cpu_times(*(tick() * w for w in (3, 0, 1, 6, 0)))
+    fake.virtual_memory = lambda: memory(float(tick() % 100))
+    fake.disk_usage = lambda path: disk(55.0)
+    fake.sensors_battery = lambda: battery(80, True)
+    fake.sensors_temperatures = lambda: {"coretemp": [temp(50.0), temp(55.0)], "acpitz": [temp(45.0)]}
+    fake.net_io_counters = lambda: net(tick() * 1500, tick() * 9000)
+    fake.pids = lambda: list(range(1, process_count + 1))
+    fake.Process = Process
+    fake.NoSuchProcess = NoSuchProcess
+    fake.AccessDenied = AccessDenied
+    fake.ZombieProcess = ZombieProcess
+    sys.modules["psutil"] = fake
+    return fake
@@ -0,0 +1,205 @@
+import json
+import os
+import tarfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from fnmatch import fnmatch
+from pathlib import Path
+
+from scanner import scan_files
+
+try:
+    import zstandard
+except ImportError:
+    # Optional: without it bundles are zip files
+    zstandard = None
+
+# Files per bundle are split by size, so a big category keeps several cores busy
+BUNDLE_MAX_BYTES = 512 * 1024 * 1024
+INDEX_NAME = "index.jsonl"
+ZSTD_LEVEL = 10
+
+# Already compressed: stored as is in zip bundles instead of deflating them again
+COMPRESSED_SUFFIXES = {
+    ".zip", ".rar", ".7z", ".gz", ".bz2", ".xz", ".zst", ".jpg", ".jpeg", ".png", ".gif", ".webp",
+    ".mp4", ".mkv", ".avi", ".mov", ".mp3", ".aac", ".ogg", ".m4a", ".flac", ".docx", ".xlsx",
+    ".pptx", ".apk", ".dmg", ".msi",
+}
+
+
+def bundle_format() -> str:
+    return "tar.zst" if zstandard is not None else "zip"
+
+
+def find_stale(folder: Path, max_age_days: float, now: float = None) -> list:
+    """(path, size, mtime) of every file under folder not modified for max_age_days."""
+    cutoff = (now or time.time()) - max_age_days * 86400
+    stale = []
+    for entry in scan_files(folder, max_depth=64):
+        try:
+            # DirEntry keeps the stat result: one syscall per file at most
+            stat = entry.stat()
+        except OSError:
+            continue
+        if stat.st_mtime < cutoff:
+            stale.append((entry.path, stat.st_size, stat.st_mtime))
+    return stale
+
+
+def split_bundles(files: list, max_bytes: int = BUNDLE_MAX_BYTES) -> list:
+    """Group files into bundles of about max_bytes each."""
+    bundles, current, size = [], [], 0
+    for item in files:
+        if current and size + item[1] > max_bytes:
+            bundles.append(current)
+            current, size = [], 0
+        current.append(item)
+        size += item[1]
+    if current:
+        bundles.append(current)
+    return bundles
+
+
+def write_bundle(bundle_path: str, root: str, paths: list) -> list:
+    """Write paths into bundle_path, reading each file in chunks. Runs in a worker process.
+
+    Returns [name inside the bundle, size, mtime, mtime_ns] for every file stored.
+    """
+    tmp = bundle_path + ".tmp"
+    stored = []
+    try:
+        if bundle_path.endswith(".tar.zst"):
+            with open(tmp, "wb") as raw:
+                compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+                with compressor.stream_writer(raw, closefd=False) as compressed:
+                    # "w|": pure stream, the tar is never seeked or held in memory
+                    with tarfile.open(fileobj=compressed, mode="w|") as tar:
+                        for path in paths:
+                            stored.append(_store(path, root, lambda p, name: tar.add(p, name, recursive=False)))
+                raw.flush()
+                os.fsync(raw.fileno())
+        else:
+            with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED, allowZip64=True) as bundle:
+                for path in paths:
+                    compress = (zipfile.ZIP_STORED if os.path.splitext(path)[1].lower() in COMPRESSED_SUFFIXES
+                                else zipfile.ZIP_DEFLATED)
+                    stored.append(_store(path, root, lambda p, name: bundle.write(p, name, compress)))
+            with open(tmp, "rb") as f:
+                os.fsync(f.fileno())
+        os.replace(tmp, bundle_path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return [item for item in stored if item]
+
+
+def _store(path: str, root: str, add):
+    try:
+        stat = os.stat(path)
+        name = os.path.relpath(path, root)
+        add(path, name)
+    except OSError:
+        # Gone or unreadable since the scan: left where it is
+        return None
+    return [name, stat.st_size, int(stat.st_mtime), stat.st_mtime_ns]
+
+
+def _bundle_path(folder: Path, category: str, date: str, fmt: str, taken: set) -> Path:
+    number = 1
+    while True:
+        name = f"{category}-{date}-{number:02d}.{fmt}"
+        if name not in taken:
+            taken.add(name)
+            return folder / name
+        number += 1
+
+
+def archive_stale(root: Path, archive_folder: Path, max_age_days: dict, workers: int = None,
+                  dry_run: bool = False) -> dict:
+    """Compress the files older than max_age_days[category] into dated bundles, in parallel.
+
+    Archived files are deleted once their bundle is safely on disk, and each
+    bundle's contents are added to the index. Returns {category: files archived}.
+    """
+    date = datetime.now().strftime("%Y-%m-%d")
+    fmt = bundle_format()
+    taken = set(os.listdir(archive_folder)) if archive_folder.is_dir() else set()
+
+    jobs = []
+    for category, days in max_age_days.items():
+        folder = root / category
+        if not folder.is_dir():
+            continue
+        for chunk in split_bundles(find_stale(folder, days)):
+            jobs.append((category, _bundle_path(archive_folder, category, date, fmt, taken), chunk))
+
+    statistics = {}
+    if dry_run:
+        for category, bundle, chunk in jobs:
+            print(f" - {len(chunk)} files from {category} -> {bundle.name}")
+            statistics[category] = statistics.get(category, 0) + len(chunk)
+        return statistics
+    if not jobs:
+        return statistics
+
+    # Only created once there is something to write (never in a dry run)
+    archive_folder.mkdir(exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool, \
+            open(archive_folder / INDEX_NAME, "a", encoding="utf-8") as index:
+        futures = {
+            pool.submit(write_bundle, str(bundle), str(root), [path for path, _, _ in chunk]): (category, bundle)
+            for category, bundle, chunk in jobs
+        }
+        for future in as_completed(futures):
+            category, bundle = futures[future]
+            try:
+                stored = future.result()
+            except Exception as e:
+                # tar/zstd errors or a crashed worker (BrokenProcessPool): the other bundles go on
+                print(f"Could not write {bundle.name}: {e}")
+                continue
+            try:
+                files = [[name, size, mtime] for name, size, mtime, _ in stored]
+                index.write(json.dumps({"bundle": bundle.name, "category": category, "files": files},
+                                       ensure_ascii=False, separators=(",", ":")) + "\n")
+                index.flush()
+                os.fsync(index.fileno())
+            except Exception as e:
+                # A bundle missing from the index can't be searched: remove it, keep the originals
+                print(f"Could not index {bundle.name}: {e}")
+                bundle.unlink(missing_ok=True)
+                continue
+
+            # Only now that bundle and index are on disk are the originals removed
+            archived = 0
+            for name, _, _, mtime_ns in stored:
+                path = root / name
+                try:
+                    # Changed while it was being archived: keep the newer version too
+                    if path.stat().st_mtime_ns == mtime_ns:
+                        path.unlink()
+                        archived += 1
+                except OSError:
+                    continue
+            statistics[category] = statistics.get(category, 0) + archived
+            print(f" - {bundle.name}: {archived} files, {bundle.stat().st_size / (1024 * 1024):.1f} MB")
+    return statistics
+
+
+def search_index(archive_folder: Path, pattern: str):
+    """Yield (bundle, name, size, mtime) of archived files whose name or path matches pattern."""
+    index_path = archive_folder / INDEX_NAME
+    if not index_path.exists():
+        return
+    with open(index_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            for name, size, mtime in record["files"]:
+                if fnmatch(os.path.basename(name), pattern) or fnmatch(name, pattern):
+                    yield record["bundle"], name, size, mtime
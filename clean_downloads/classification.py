@@ -0,0 +1,34 @@
+from pathlib import Path
+
+
+def parse_rules(text: str) -> dict:
+    """Parse 'ext=CATEGORY[/SUBFOLDER],...' into a rules dict."""
+    rules = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        extension, _, destination = item.partition("=")
+        if not destination:
+            raise ValueError(f"Invalid rule {item!r}, expected .ext=CATEGORY[/SUBFOLDER]")
+        rules[extension.strip()] = destination.strip()
+    return rules
+
+
+def build_classification_table(categories: dict, subcategories: dict, rules: dict) -> dict:
+    """Compile categories, subcategories and rules into one extension -> (category, folder) table."""
+    table = {}
+    # Same precedence as scanning the lists in order: the first match wins
+    for category, extensions in categories.items():
+        for extension in extensions:
+            table.setdefault(extension, (category, Path(category)))
+    refined = set()
+    for subcategory, extensions in subcategories.items():
+        for extension in extensions:
+            if table.get(extension, ("",))[0] == "DOCUMENTS" and extension not in refined:
+                table[extension] = ("DOCUMENTS", Path("DOCUMENTS", subcategory))
+                refined.add(extension)
+    for extension, destination in rules.items():
+        extension = extension.lower()
+        if not extension.startswith("."):
+            extension = "." + extension
+        folder = Path(destination.strip("/"))
+        table[extension] = (folder.parts[0], folder)
+    return table
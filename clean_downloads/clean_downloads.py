@@ -1,8 +1,19 @@
+import argparse
+import functools
 import os
-import shutil
+import threading
+import time
 from pathlib import Path
 from collections import defaultdict
 from dotenv import load_dotenv
+from archiver import archive_stale, bundle_format, search_index
+from classification import build_classification_table, parse_rules
+from dedup import HashCache, existing_files, find_duplicates, hard_link
+from destinations import DestinationAllocator
+from journal import Journal
+from move_executor import MoveExecutor
+from scanner import prefetch, scan_files
+from sniffing import ContentSniffer
 
 #-----------------------
 # CONFIGURATION
@@ -38,6 +49,52 @@ SUBCATEGORIES = {
 }
 
 
+# Your own rules, extension -> CATEGORY or CATEGORY/SUBFOLDER. They override the tables above.
+# They can also be set in .env, e.g. CUSTOM_RULES=.iso=INSTALLERS,.epub=DOCUMENTS/BOOKS
+CUSTOM_RULES = {}
+CUSTOM_RULES.update(parse_rules(os.getenv("CUSTOM_RULES", "")))
+
+# Built once at startup: classifying a file is a single dictionary lookup
+CLASSIFICATION_TABLE = build_classification_table(CATEGORIES, SUBCATEGORIES, CUSTOM_RULES)
+
+
+# Temporary files written by browsers while a download is in progress
+PARTIAL_SUFFIXES = (".crdownload", ".part", ".partial", ".download", ".tmp")
+
+# Parallel copies when the category folders are on another disk
+MOVE_WORKERS = 4
+
+# How many levels of subfolders to organize too (0 = only the files directly in the downloads folder)
+SCAN_DEPTH = 0
+
+# Files and folders to leave alone, as glob patterns (e.g. "*.iso", "projects/*")
+SCAN_EXCLUDE = []
+
+# Files found by the scanner waiting to be moved; keeps memory flat on huge trees
+SCAN_QUEUE_SIZE = 1024
+
+# Content hashes of already checked files, so duplicates are found without re-reading them
+HASH_CACHE_FILE = Path.home() / ".cache" / "clean_downloads" / "hashes.json"
+
+# Look at the first bytes of a file to find its real type:
+# "unknown" only for extensions not in the categories, "all" to also catch mislabelled files, "off"
+SNIFF_CONTENT = "unknown"
+TYPE_CACHE_FILE = Path.home() / ".cache" / "clean_downloads" / "types.json"
+
+# Every run records its moves here, so it can be resumed (--resume) or undone (--undo)
+JOURNAL_DIR = Path.home() / ".cache" / "clean_downloads" / "journals"
+JOURNAL_KEEP = 20
+
+# Days without changes after which the files of a category are compressed with --archive
+ARCHIVE_AFTER_DAYS = {"ARCHIVES": 180, "INSTALLERS": 90, "OTHERS": 90}
+
+# Where the compressed bundles (tar.zst, or zip without the zstandard package) and their index go
+ARCHIVE_FOLDER = DOWNLOADS_FOLDER / "ARCHIVED"
+
+# Seconds a new file must stay untouched before it is organized in --watch mode
+WATCH_DEBOUNCE = 2.0
+
+
 #----------------------
 # FUNCTIONS
 #----------------------
@@ -46,67 +103,352 @@ def create_folder(path: Path):
     """Create a folder if it doesn't exist."""
     path.mkdir(parents=True, exist_ok=True)
     
-def move_file(file: Path, target: Path):
-    """Move a file to the target folder."""
-    final_target = target / file.name
-    counter = 1
-    while target.exists():
-        target = target / f"{file.stem}_{counter}{file.suffix}"
-        counter += 1
-    shutil.move(str(file), str(final_target))
-    return final_target
-        
-def organize_files():
-    """Classify and move files, returning statistics."""
+def classify(file: Path, sniffer: ContentSniffer = None, sniff: str = SNIFF_CONTENT) -> tuple:
+    """Return the (category, target folder) for a file based on its extension or its content."""
+    extension = file.suffix.lower()
+    if sniffer is not None and (sniff == "all" or extension not in CLASSIFICATION_TABLE):
+        extension = sniffer.extension(file, extension)
+    category, folder = CLASSIFICATION_TABLE.get(extension, (OTHERS, Path(OTHERS)))
+    return category, DOWNLOADS_FOLDER / folder
+
+def plan_moves(files, sniff: str = SNIFF_CONTENT):
+    """Yield (file, category, destination) for each file, with a free destination name."""
+    sniffer = ContentSniffer(TYPE_CACHE_FILE) if sniff != "off" else None
+    # Each destination folder is listed once for the whole batch
+    allocator = DestinationAllocator()
+    try:
+        for file in files:
+            category, folder = classify(file, sniffer, sniff)
+            yield file, category, allocator.allocate(folder, file.name)
+    finally:
+        if sniffer is not None:
+            sniffer.save()
+
+def execute_moves(entries, on_moved=None) -> dict:
+    """Move every (id, source, destination, category), creating each destination folder once.
+
+    Paths can be Path objects or strings. on_moved(id) is called for each file
+    that reached its destination.
+    """
+    created = set()
     statistics = defaultdict(int)
-    
+    lock = threading.Lock()
+
+    def finished(entry_id, category, error):
+        if error is None:
+            if on_moved:
+                on_moved(entry_id)
+        else:
+            with lock:
+                statistics[category] -= 1
+
+    with MoveExecutor(MOVE_WORKERS) as executor:
+        for entry_id, source, destination, category in entries:
+            folder = os.path.dirname(destination)
+            if folder not in created:
+                create_folder(Path(folder))
+                created.add(folder)
+            with lock:
+                statistics[category] += 1
+            executor.submit(source, destination, functools.partial(finished, entry_id, category))
+
+    for result in executor.results:
+        print_throughput(result)
+    for file, error in executor.errors:
+        print(f"Could not move {os.path.basename(file)}: {error}")
+    return statistics
+
+def organize_batch(files, sniff: str = SNIFF_CONTENT, journal: Journal = None) -> dict:
+    """Classify and move files. With a journal, the whole plan is recorded before moving."""
+    moves = plan_moves(files, sniff)
+    if journal is None:
+        return execute_moves((None, file, destination, category) for file, category, destination in moves)
+
+    # Phase 1: the complete plan goes to the journal (on disk, so memory stays flat)
+    count = 0
+    for count, (file, category, destination) in enumerate(moves, 1):
+        journal.plan(count, file, destination, category)
+    if count == 0:
+        # Nothing to move: an empty journal would hide the last real run from --undo/--resume
+        journal.discard()
+        return defaultdict(int)
+    journal.planned(count)
+    Journal.prune(journal.path.parent, JOURNAL_KEEP)
+    # Phase 2: replay the plan from the journal, recording each finished move
+    statistics = execute_moves(journal.entries(), journal.done)
+    journal.write({"op": "end"})
+    return statistics
+
+def preview_moves(files, sniff: str = SNIFF_CONTENT) -> dict:
+    """Print what would be moved where, without touching anything."""
+    statistics = defaultdict(int)
+    for file, category, destination in plan_moves(files, sniff):
+        print(f" - {file.relative_to(DOWNLOADS_FOLDER)} -> {destination.relative_to(DOWNLOADS_FOLDER)}")
+        statistics[category] += 1
+    return statistics
+
+def handle_duplicates(files: list, mode: str):
+    """Report duplicated files, or replace them with hard links when mode is 'link'."""
+    cache = HashCache(HASH_CACHE_FILE)
+    # New files are also compared with the ones already organized (re-downloads)
+    categories = {category for category, _ in CLASSIFICATION_TABLE.values()} | {OTHERS}
+    existing = existing_files(sorted(DOWNLOADS_FOLDER / category for category in categories), cache)
+    duplicates = find_duplicates(files, cache, existing)
+    cache.save()
+
+    wasted = 0
+    for (original, size, _), *copies in duplicates:
+        print(f"Duplicates of {original.relative_to(DOWNLOADS_FOLDER)}:")
+        for duplicate, _, _ in copies:
+            if mode == "link":
+                try:
+                    hard_link(original, duplicate)
+                except OSError as e:
+                    print(f" - {duplicate.relative_to(DOWNLOADS_FOLDER)} (could not link: {e})")
+                    continue
+            print(f" - {duplicate.relative_to(DOWNLOADS_FOLDER)}")
+            wasted += size
+    if duplicates:
+        action = "Freed" if mode == "link" else "Wasted"
+        print(f"{action} by duplicates: {wasted / (1024 * 1024):.1f} MB")
+
+def find_files(depth: int = SCAN_DEPTH, exclude=SCAN_EXCLUDE):
+    """Yield the files to organize, walking subfolders up to depth but never the category folders."""
+    category_folders = {category for category, _ in CLASSIFICATION_TABLE.values()} | {OTHERS, ARCHIVE_FOLDER.name}
+    for entry in scan_files(DOWNLOADS_FOLDER, depth, exclude, category_folders):
+        if not is_partial_download(entry.name):
+            yield Path(entry.path)
+
+def organize_files(dedup: str = None, depth: int = SCAN_DEPTH, exclude=SCAN_EXCLUDE,
+                   sniff: str = SNIFF_CONTENT, dry_run: bool = False):
+    """Classify and move files, returning statistics."""
     if not DOWNLOADS_FOLDER.exists():
         print(f"The specified path {DOWNLOADS_FOLDER} does not exist.")
         return None
-    
-    for file in DOWNLOADS_FOLDER.iterdir():
-        if file.is_file():
-            extension = file.suffix.lower()
-            target_category = None
-            
-            for category, extensions in CATEGORIES.items():
-                if extension in extensions:
-                    target_category = category
-                    break
-            
-            if not target_category:
-                target_category = "OTHERS"
-            
-            target_folder = DOWNLOADS_FOLDER / target_category
-            create_folder(target_folder)
-
-            if target_category == "DOCUMENTS":
-                subcategory = None
-                for key, exts in SUBCATEGORIES.items():
-                    if extension in exts:
-                        subcategory = key
-                        break
-                if subcategory:
-                    target_folder = target_folder / subcategory
-                    create_folder(target_folder)
-
-            move_file(file, target_folder)
-            statistics[target_category] += 1
-            
-    return statistics
 
-# ---------------------
-# MAIN PROGRAM
-# ---------------------
-if __name__ == "__main__":
-    print("Initializing file organization...")
-    stats = organize_files()
+    if dedup:
+        # Duplicates can only be found once every file is known
+        files = list(find_files(depth, exclude))
+        handle_duplicates(files, "report" if dry_run else dedup)
+    else:
+        # Planning starts while the walk is still going
+        files = prefetch(find_files(depth, exclude), SCAN_QUEUE_SIZE)
+
+    if dry_run:
+        return preview_moves(files, sniff)
+    with Journal.create(JOURNAL_DIR) as journal:
+        return organize_batch(files, sniff, journal)
+
+def resume_run():
+    """Finish the moves of the last run if it was interrupted, without scanning again."""
+    path = Journal.latest(JOURNAL_DIR)
+    if path is None:
+        print("There is no run to resume.")
+        return None
+    with Journal(path) as journal:
+        state = journal.state()
+        if state["ended"]:
+            print("The last run finished, there is nothing to resume.")
+            return None
+        if not state["planned"]:
+            print("The last run stopped while planning, before moving any file. Run it again.")
+            return None
+
+        def pending():
+            for entry_id, source, destination, category in journal.entries(exclude=state["done"]):
+                if os.path.exists(source):
+                    yield entry_id, source, destination, category
+                elif os.path.exists(destination):
+                    # Moved just before the crash, but its record was not synced yet
+                    journal.done(entry_id)
+                else:
+                    print(f"Skipping {os.path.basename(source)}: it is no longer there.")
+
+        statistics = execute_moves(pending(), journal.done)
+        journal.write({"op": "end"})
+        return statistics
+
+def undo_run():
+    """Move every file of the last run back where it was, newest move first."""
+    path = Journal.latest(JOURNAL_DIR)
+    if path is None:
+        print("There is nothing to undo.")
+        return None
+    with Journal(path) as journal:
+        state = journal.state()
+        if not state["done"] - state["undone"]:
+            print("There is nothing to undo.")
+            return None
+        moved = list(journal.entries(ids=state["done"], exclude=state["undone"]))
+
+        def restorable():
+            for entry_id, source, destination, category in reversed(moved):
+                name = os.path.basename(destination)
+                if not os.path.exists(destination):
+                    print(f"Skipping {name}: it is no longer in {os.path.dirname(destination)}.")
+                elif os.path.exists(source):
+                    print(f"Skipping {name}: {source} exists again.")
+                else:
+                    yield entry_id, destination, source, category
+
+        statistics = execute_moves(restorable(), journal.undone)
+        journal.write({"op": "undo-end"})
+        return statistics
+
+def archive_files(dry_run: bool = False):
+    """Compress the files that have been in a category folder for too long."""
+    print(f"Archiving old files as {bundle_format()} bundles in {ARCHIVE_FOLDER}...")
+    statistics = archive_stale(DOWNLOADS_FOLDER, ARCHIVE_FOLDER, ARCHIVE_AFTER_DAYS, dry_run=dry_run)
+    if not statistics:
+        print("No old files to archive.")
+    for category, count in statistics.items():
+        print(f" - {category}: {count} files {'to archive' if dry_run else 'archived'}")
+
+def find_archived(pattern: str):
+    """Print the bundles that contain files matching pattern."""
+    found = False
+    for bundle, name, size, mtime in search_index(ARCHIVE_FOLDER, pattern):
+        modified = time.strftime("%Y-%m-%d", time.localtime(mtime))
+        print(f"{bundle}: {name} ({size / 1024:.1f} KB, {modified})")
+        found = True
+    if not found:
+        print(f"No archived file matches {pattern!r}.")
+
+def is_partial_download(name: str) -> bool:
+    """True for files a browser is still writing."""
+    return name.lower().endswith(PARTIAL_SUFFIXES)
+
+def watch_downloads(debounce: float = WATCH_DEBOUNCE, dedup: str = None, sniff: str = SNIFF_CONTENT):
+    """Organize new downloads as they arrive, using inotify instead of rescanning."""
+    from inotify_watch import IN_CLOSE_WRITE, IN_ISDIR, IN_MOVED_TO, IN_Q_OVERFLOW, InotifyWatcher
+
+    if not DOWNLOADS_FOLDER.exists():
+        print(f"The specified path {DOWNLOADS_FOLDER} does not exist.")
+        return
+
+    with InotifyWatcher(DOWNLOADS_FOLDER, IN_CLOSE_WRITE | IN_MOVED_TO) as watcher:
+        # Files that were already there before the watch started
+        print_summary(organize_files(dedup, sniff=sniff))
+        print(f"Watching {DOWNLOADS_FOLDER} for new files (Ctrl+C to stop)...")
+
+        pending = {}
+        try:
+            while True:
+                events = watcher.read_events(timeout=debounce if pending else None)
+                now = time.monotonic()
+                for mask, name in events:
+                    if mask & IN_Q_OVERFLOW:
+                        # Events were lost: fall back to one full scan
+                        pending.clear()
+                        print_summary(organize_files(sniff=sniff))
+                        continue
+                    if mask & IN_ISDIR or not name or is_partial_download(name):
+                        continue
+                    # Every new event for the same name restarts its quiet period
+                    pending[name] = now
+
+                ready = [name for name, seen in pending.items() if now - seen >= debounce]
+                if not ready:
+                    continue
+
+                files = []
+                for name in ready:
+                    del pending[name]
+                    file = DOWNLOADS_FOLDER / name
+                    # Firefox keeps an empty placeholder while NAME.part is still being written
+                    if any((DOWNLOADS_FOLDER / (name + suffix)).exists() for suffix in PARTIAL_SUFFIXES):
+                        continue
+                    if file.is_file():
+                        files.append(file)
+                statistics = organize_batch(files, sniff)
+                if statistics:
+                    print_summary(statistics)
+        except KeyboardInterrupt:
+            print("Stopped watching.")
+
+def print_throughput(result):
+    """Print how fast a cross-device copy went."""
+    megabytes = result.size / (1024 * 1024)
+    speed = megabytes / result.seconds if result.seconds > 0 else 0
+    print(f" - Copied {os.path.basename(result.source)} ({megabytes:.1f} MB) in {result.seconds:.2f}s, "
+          f"{speed:.1f} MB/s [{result.method}]")
+
+def print_summary(stats, title: str = "Files organized succesfully"):
+    """Print the statistics returned by organize_files."""
     if stats is not None:
-        print("Files organized succesfully")
+        print(title)
         print("Summary:")
         total = sum(stats.values())
         for category, count in stats.items():
             print(f" - {category}: {count} files")
         print(f"    - Total moved: {total} files")
     else:
-        print("No files were organized.")
\ No newline at end of file
+        print("No files were organized.")
+
+# ---------------------
+# MAIN PROGRAM
+# ---------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Organize the downloads folder by file type.")
+    # Modes other than a normal run: only one at a time
+    modes = parser.add_mutually_exclusive_group()
+    modes.add_argument("--watch", action="store_true",
+                       help="keep running and organize new downloads as they arrive (Linux)")
+    parser.add_argument("--depth", type=int,
+                        help=f"also organize files in subfolders up to this depth (default {SCAN_DEPTH})")
+    parser.add_argument("--exclude", action="append", metavar="PATTERN",
+                        help="skip files and folders matching this glob pattern (can be repeated)")
+    parser.add_argument("--sniff", choices=("off", "unknown", "all"), default=SNIFF_CONTENT,
+                        help="detect the file type from its content: for unknown extensions only, "
+                             "for every file, or never")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="only show where each file would go")
+    modes.add_argument("--resume", action="store_true",
+                       help="finish the last run if it was interrupted")
+    modes.add_argument("--undo", action="store_true",
+                       help="move the files of the last run back where they were")
+    parser.add_argument("--archive", action="store_true",
+                        help="after organizing, compress the files older than ARCHIVE_AFTER_DAYS")
+    modes.add_argument("--find-archived", metavar="PATTERN",
+                       help="search the archived bundles for a file name (glob pattern)")
+    parser.add_argument("--dedup", choices=("report", "link"),
+                        help="find duplicated files before moving them: list them, "
+                             "or replace the copies with hard links")
+    args = parser.parse_args()
+
+    # Options the other modes would silently ignore are rejected instead
+    mode = next((flag for flag, on in (("--watch", args.watch), ("--resume", args.resume),
+                                       ("--undo", args.undo), ("--find-archived", args.find_archived))
+                 if on), None)
+    if mode and args.dry_run:
+        parser.error(f"--dry-run can't be used with {mode}")
+    if mode and args.archive:
+        parser.error(f"--archive can't be used with {mode}")
+    if args.watch and (args.depth is not None or args.exclude):
+        parser.error("--depth and --exclude can't be used with --watch (it uses SCAN_DEPTH and SCAN_EXCLUDE)")
+    depth = SCAN_DEPTH if args.depth is None else args.depth
+    exclude = list(SCAN_EXCLUDE) + (args.exclude or [])
+
+    if args.find_archived:
+        find_archived(args.find_archived)
+    elif args.watch:
+        watch_downloads(dedup=args.dedup, sniff=args.sniff)
+    elif args.resume:
+        print("Resuming the last run...")
+        print_summary(resume_run())
+    elif args.undo:
+        print("Undoing the last run...")
+        print_summary(undo_run(), "Files restored")
+    elif args.dry_run:
+        print("Planned moves (nothing will be changed):")
+        statistics = organize_files(args.dedup, depth, exclude, args.sniff, dry_run=True)
+        print_summary(statistics, "Nothing was moved (dry run)")
+        # None: the downloads folder doesn't exist, there is nothing to archive either
+        if args.archive and statistics is not None:
+            archive_files(dry_run=True)
+    else:
+        print("Initializing file organization...")
+        statistics = organize_files(args.dedup, depth, exclude, args.sniff)
+        print_summary(statistics)
+        if args.archive and statistics is not None:
+            archive_files()
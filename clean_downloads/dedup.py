@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import tempfile
+from collections import defaultdict
+from pathlib import Path
+
+from scanner import scan_files
+
+# Bytes hashed from each end of the file in the cheap first pass
+EDGE_BLOCK = 64 * 1024
+READ_CHUNK = 1024 * 1024
+
+
+def _new_hash():
+    return hashlib.blake2b(digest_size=20)
+
+
+def partial_hash(path: Path, size: int) -> str:
+    """Hash of the first and last blocks, enough to tell most same-size files apart."""
+    digest = _new_hash()
+    with open(path, "rb") as f:
+        digest.update(f.read(EDGE_BLOCK))
+        if size > EDGE_BLOCK:
+            f.seek(max(EDGE_BLOCK, size - EDGE_BLOCK))
+            digest.update(f.read(EDGE_BLOCK))
+    return digest.hexdigest()
+
+
+def full_hash(path: Path) -> str:
+    """Streaming hash of the whole file, in constant memory."""
+    digest = _new_hash()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class HashCache:
+    """Values computed from a file's content, saved on disk by (inode, size, mtime).
+
+    Unchanged files are never read again; a changed file gets a new key.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.entries = {}
+        self.used = set()
+        self.changed = False
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    @staticmethod
+    def key(stat: os.stat_result) -> str:
+        return f"{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def touch(self, inode: int, size: int, mtime_ns: int):
+        """Mark a file as still present, so save() keeps its entry."""
+        self.used.add(f"{inode}:{size}:{mtime_ns}")
+
+    def get(self, stat: os.stat_result, kind: str):
+        key = self.key(stat)
+        self.used.add(key)
+        return self.entries.get(key, {}).get(kind)
+
+    def set(self, stat: os.stat_result, kind: str, value: str):
+        key = self.key(stat)
+        self.used.add(key)
+        self.entries.setdefault(key, {})[kind] = value
+        self.changed = True
+
+    def save(self):
+        """Write the cache atomically, keeping only the files seen or touched in this run."""
+        entries = {key: value for key, value in self.entries.items() if key in self.used}
+        if not self.changed and len(entries) == len(self.entries):
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=".hashes-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entries, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+        self.entries = entries
+        self.changed = False
+
+
+def _cached(cache: HashCache, kind: str, path: Path, stat: os.stat_result, compute) -> str:
+    value = cache.get(stat, kind)
+    if value is None:
+        value = compute()
+        cache.set(stat, kind, value)
+    return value
+
+
+def _refine(groups, cache: HashCache, kind: str, compute):
+    """Split each group of candidates by a hash, dropping the ones left alone."""
+    for group in groups:
+        buckets = defaultdict(list)
+        for path, stat, is_new in group:
+            try:
+                value = _cached(cache, kind, path, stat, lambda: compute(path, stat))
+            except OSError:
+                continue
+            buckets[value].append((path, stat, is_new))
+        yield from (bucket for bucket in buckets.values() if len(bucket) > 1)
+
+
+def existing_files(folders, cache: HashCache):
+    """Yield (path, size) of the files already organized in folders.
+
+    Every file is touched in the cache, so the hashes of organized files
+    survive until they are deleted or changed.
+    """
+    for folder in folders:
+        if not os.path.isdir(folder):
+            continue
+        for entry in scan_files(folder, max_depth=64):
+            try:
+                stat = entry.stat()
+                cache.touch(entry.inode(), stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                continue
+            yield Path(entry.path), stat.st_size
+
+
+def find_duplicates(files, cache: HashCache, existing=()) -> list:
+    """Group identical files: by size, then by partial hash, then by full hash.
+
+    files are the new files; existing are (path, size) of files already
+    organized, compared only when a new file has the same size. Each group
+    holds at least one new file and is a list of (path, size, is_new); the
+    first one is the copy to keep: an organized file if there is one, else
+    the shortest name, so 'file.pdf' wins over 'file (1).pdf'.
+    """
+    by_size = defaultdict(list)
+    for path in files:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        if stat.st_size:
+            by_size[stat.st_size].append((path, stat, True))
+    for path, size in existing:
+        if size in by_size:
+            try:
+                by_size[size].append((path, os.stat(path), False))
+            except OSError:
+                continue
+
+    # Files with a unique size can't have a duplicate and are never opened
+    groups = (group for group in by_size.values() if len(group) > 1)
+    groups = _refine(groups, cache, "partial", lambda path, stat: partial_hash(path, stat.st_size))
+    # Small files were already hashed whole by the partial pass
+    groups = _refine(groups, cache, "full", lambda path, stat: full_hash(path)
+                     if stat.st_size > 2 * EDGE_BLOCK else cache.get(stat, "partial"))
+
+    duplicates = []
+    for group in groups:
+        if not any(is_new for _, _, is_new in group):
+            continue
+        # Already hard links of the same file: nothing to save
+        inodes = {}
+        order = sorted(group, key=lambda item: (item[2], len(item[0].name), item[1].st_mtime, item[0].name))
+        for path, stat, is_new in order:
+            inodes.setdefault((stat.st_dev, stat.st_ino), (path, stat.st_size, is_new))
+        kept, *copies = inodes.values()
+        copies = [copy for copy in copies if copy[2]]
+        if copies:
+            duplicates.append([kept] + copies)
+    return duplicates
+
+
+def hard_link(original: Path, duplicate: Path):
+    """Replace duplicate with a hard link to original, atomically."""
+    tmp = duplicate.with_name(f".{duplicate.name}.link")
+    os.link(original, tmp)
+    os.replace(tmp, duplicate)
@@ -0,0 +1,49 @@
+import os
+import threading
+from pathlib import Path
+
+
+class DestinationAllocator:
+    """Hands out free file names in each target folder without touching the disk again.
+
+    Every folder is listed once; after that, names and the next counter of each
+    stem live in memory, so 'report.pdf' becomes 'report_1.pdf', 'report_2.pdf'...
+    Safe to share between threads moving files in parallel.
+    """
+
+    def __init__(self):
+        self._names = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def _index(self, folder: Path) -> set:
+        names = self._names.get(folder)
+        if names is None:
+            try:
+                # normcase: on Windows 'File.pdf' and 'file.pdf' are the same file
+                names = {os.path.normcase(name) for name in os.listdir(folder)}
+            except FileNotFoundError:
+                names = set()
+            self._names[folder] = names
+        return names
+
+    def allocate(self, folder: Path, name: str) -> Path:
+        """Reserve a name in folder that is not used yet and return its full path."""
+        with self._lock:
+            names = self._index(folder)
+            key = os.path.normcase(name)
+            if key not in names:
+                names.add(key)
+                return folder / name
+
+            path = Path(name)
+            stem, suffix = path.stem, path.suffix
+            counter_key = (folder, os.path.normcase(stem + suffix))
+            counter = self._counters.get(counter_key, 1)
+            candidate = f"{stem}_{counter}{suffix}"
+            while os.path.normcase(candidate) in names:
+                counter += 1
+                candidate = f"{stem}_{counter}{suffix}"
+            self._counters[counter_key] = counter + 1
+            names.add(os.path.normcase(candidate))
+            return folder / candidate
@@ -0,0 +1,86 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+from pathlib import Path
+
+#-----------------------
+# INOTIFY CONSTANTS (linux/inotify.h)
+#-----------------------
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+EVENT_HEADER = struct.Struct("iIII")
+READ_SIZE = 64 * 1024
+
+
+class InotifyWatcher:
+    """Minimal inotify wrapper (Linux only) built on ctypes, with no extra dependencies."""
+
+    def __init__(self, path: Path, mask: int = IN_CLOSE_WRITE | IN_MOVED_TO):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        try:
+            self._libc = ctypes.CDLL(libc_name, use_errno=True)
+            self._libc.inotify_init1
+        except (OSError, AttributeError) as e:
+            raise OSError("inotify is only available on Linux") from e
+
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask | IN_ONLYDIR)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"Cannot watch {path}: {os.strerror(errno)}")
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def read_events(self, timeout: float = None) -> list:
+        """Wait up to timeout seconds and return a list of (mask, name) events."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        events = []
+        # Drain everything queued so a burst of downloads is handled as one batch
+        while True:
+            try:
+                data = os.read(self.fd, READ_SIZE)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                events.append((mask, os.fsdecode(name)))
+            if len(data) < READ_SIZE:
+                break
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
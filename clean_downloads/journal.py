@@ -0,0 +1,151 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+
+class Journal:
+    """Append-only record of one organize run: the planned moves, then each one done.
+
+    Lines are JSON objects:
+      {"op": "plan", "id": 3, "src": ..., "dst": ..., "category": ...}
+      {"op": "planned", "count": 120}     the plan is complete, moves may start
+      {"op": "done", "id": 3}             the file is at dst
+      {"op": "undone", "id": 3}           the file is back at src
+      {"op": "end"} / {"op": "undo-end"}
+    Writes are fsynced in batches, so a crash loses at most the last few
+    records; resume and undo check the disk for those.
+    """
+
+    def __init__(self, path: Path, fsync_every: int = 200, fsync_interval: float = 2.0):
+        self.path = Path(path)
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        # A crash can leave half a line at the end, possibly cut inside a multibyte
+        # character: checked in binary, the next record starts on its own line
+        with open(self.path, "ab+") as f:
+            if f.tell():
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        # Moves finish on the executor's threads
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, directory: Path, **kwargs):
+        """New journal for a run that starts now."""
+        directory.mkdir(parents=True, exist_ok=True)
+        name = datetime.now().strftime("run-%Y%m%d-%H%M%S-%f.jsonl")
+        return cls(directory / name, **kwargs)
+
+    @staticmethod
+    def prune(directory: Path, keep: int):
+        """Delete all but the last keep journals."""
+        for old in sorted(directory.glob("run-*.jsonl"))[:-keep or None]:
+            old.unlink(missing_ok=True)
+
+    @staticmethod
+    def latest(directory: Path):
+        """Path of the most recent journal, or None."""
+        journals = sorted(directory.glob("run-*.jsonl")) if directory.exists() else []
+        return journals[-1] if journals else None
+
+    def write(self, record: dict):
+        self._write_line(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+
+    def _write_line(self, line: str):
+        with self._lock:
+            self._file.write(line + "\n")
+            self._unsynced += 1
+            if (self._unsynced >= self.fsync_every
+                    or time.monotonic() - self._last_sync >= self.fsync_interval):
+                self._sync()
+
+    def plan(self, entry_id: int, source: Path, destination: Path, category: str):
+        self.write({"op": "plan", "id": entry_id, "src": str(source), "dst": str(destination),
+                    "category": category})
+
+    def planned(self, count: int):
+        self.write({"op": "planned", "count": count})
+        # The plan must be on disk before the first file moves
+        self.flush()
+
+    # One of these per file: formatted by hand, there is nothing to escape
+    def done(self, entry_id: int):
+        self._write_line(f'{{"op":"done","id":{entry_id}}}')
+
+    def undone(self, entry_id: int):
+        self._write_line(f'{{"op":"undone","id":{entry_id}}}')
+
+    def flush(self):
+        with self._lock:
+            self._sync()
+
+    def _sync(self):
+        if self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if self._file:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def discard(self):
+        """Close and delete the journal (a run that had nothing to move)."""
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def records(self):
+        """Read the journal back, skipping a line cut short by a crash."""
+        # Bytes: json.loads decodes each line, so a cut UTF-8 character is a ValueError here
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+    def state(self):
+        """Summary of the journal: whether the plan is complete, finished, and ids done/undone."""
+        state = {"planned": False, "ended": False, "undo_ended": False, "done": set(), "undone": set()}
+        for record in self.records():
+            op = record.get("op")
+            if op == "planned":
+                state["planned"] = True
+            elif op == "done":
+                state["done"].add(record["id"])
+            elif op == "undone":
+                state["undone"].add(record["id"])
+            elif op == "end":
+                state["ended"] = True
+            elif op == "undo-end":
+                state["undo_ended"] = True
+        return state
+
+    def entries(self, ids=None, exclude=()):
+        """Stream the planned moves (id, src, dst, category), optionally only some ids.
+
+        Paths are plain strings: building Path objects here costs more than the moves.
+        """
+        for record in self.records():
+            if record.get("op") != "plan":
+                continue
+            entry_id = record["id"]
+            if (ids is None or entry_id in ids) and entry_id not in exclude:
+                yield entry_id, record["src"], record["dst"], record["category"]
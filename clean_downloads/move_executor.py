@@ -0,0 +1,187 @@
+import contextlib
+import errno
+import os
+import shutil
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# One finished cross-device move. method is the copy primitive used
+MoveResult = namedtuple("MoveResult", "source destination size seconds method")
+
+COPY_CHUNK = 64 * 1024 * 1024
+
+# Errors that mean "this copy primitive can't be used here", not "the copy failed"
+_UNSUPPORTED = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.EBADF}
+
+# os.link errors that mean "no hard links on this filesystem": fall back to copying
+_NO_LINK = {errno.EXDEV, errno.EPERM, errno.EOPNOTSUPP, errno.ENOSYS, errno.EMLINK}
+
+
+def _copy_range(src_fd: int, dst_fd: int, size: int) -> int:
+    copied = 0
+    while copied < size:
+        sent = os.copy_file_range(src_fd, dst_fd, min(COPY_CHUNK, size - copied))
+        if sent == 0:
+            break
+        copied += sent
+    return copied
+
+
+def _copy_sendfile(src_fd: int, dst_fd: int, size: int) -> int:
+    copied = 0
+    while copied < size:
+        sent = os.sendfile(dst_fd, src_fd, copied, min(COPY_CHUNK, size - copied))
+        if sent == 0:
+            break
+        copied += sent
+    return copied
+
+
+def copy_file(source: Path, destination: Path) -> str:
+    """Copy the data inside the kernel when possible. Returns the method used."""
+    size = os.stat(source).st_size
+    # "x": never overwrite a file that appeared in the meantime
+    with open(source, "rb") as src, open(destination, "xb") as dst:
+        for method, copy in (("copy_file_range", _copy_range), ("sendfile", _copy_sendfile)):
+            if not hasattr(os, method):
+                continue
+            try:
+                # Some filesystems return 0 instead of an error: a short copy means "not supported"
+                if copy(src.fileno(), dst.fileno(), size) == size:
+                    return method
+            except OSError as e:
+                if e.errno not in _UNSUPPORTED:
+                    raise
+            # Nothing usable was written: start again with the next method
+            dst.seek(0)
+            dst.truncate()
+            src.seek(0)
+        shutil.copyfileobj(src, dst, COPY_CHUNK)
+        if dst.tell() != size:
+            raise OSError(errno.EIO, f"Copied {dst.tell()} of {size} bytes", str(source))
+        return "copy"
+
+
+class MoveExecutor:
+    """Link+unlink on the same device, copy in a bounded thread pool across devices.
+
+    Neither path ever replaces an existing destination: it is reported as a
+    FileExistsError and the source is left in place.
+    """
+
+    def __init__(self, workers: int = 4):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="move")
+        # At most two queued copies per worker, so a huge batch doesn't pile up in memory
+        self._slots = threading.BoundedSemaphore(workers * 2)
+        self._futures = []
+        self._devices = {}
+        # Renames are only counted; results are kept for copies, to report their speed
+        self.renamed = 0
+        self.results = []
+        self.errors = []
+
+    def _device(self, folder) -> int:
+        device = self._devices.get(folder)
+        if device is None:
+            device = self._devices[folder] = os.stat(folder).st_dev
+        return device
+
+    def submit(self, source: Path, destination: Path, on_done=None):
+        """Move source to destination (full file paths, as Path or str).
+
+        on_done(error) is called once the file is in place (error None) or the
+        move failed; for copies it runs on a worker thread.
+        """
+        try:
+            stat = os.stat(source)
+        except OSError as e:
+            self._failed(source, e, on_done)
+            return
+        if stat.st_dev == self._device(os.path.dirname(destination)):
+            try:
+                self._link_move(source, destination)
+            except OSError as e:
+                if e.errno not in _NO_LINK:
+                    self._failed(source, e, on_done)
+                    return
+                # No hard links here (FAT, some network shares, bind mounts): copy it
+            else:
+                self.renamed += 1
+                if on_done:
+                    on_done(None)
+                return
+
+        self._slots.acquire()
+        future = self._pool.submit(self._copy_move, source, destination, stat.st_size)
+
+        def finished(future):
+            self._slots.release()
+            if on_done:
+                on_done(future.exception())
+
+        future.add_done_callback(finished)
+        self._futures.append((source, future))
+        if len(self._futures) >= 64:
+            self._collect(done_only=True)
+
+    @staticmethod
+    def _link_move(source, destination):
+        """Rename that never replaces an existing destination (os.rename would, on POSIX)."""
+        try:
+            os.link(source, destination)
+        except FileExistsError:
+            # Already linked by a run that stopped before removing the source
+            if not os.path.samefile(source, destination):
+                raise
+        os.unlink(source)
+
+    def _failed(self, source: Path, error: OSError, on_done):
+        self.errors.append((source, error))
+        if on_done:
+            on_done(error)
+
+    def _copy_move(self, source: Path, destination: Path, size: int) -> MoveResult:
+        start = time.perf_counter()
+        try:
+            method = copy_file(source, destination)
+            shutil.copystat(source, destination)
+        except FileExistsError:
+            raise
+        except BaseException:
+            # Never leave half a file behind; the source is still intact
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(destination)
+            raise
+        os.unlink(source)
+        return MoveResult(source, destination, size, time.perf_counter() - start, method)
+
+    def _collect(self, done_only: bool = False):
+        pending = []
+        for source, future in self._futures:
+            if done_only and not future.done():
+                pending.append((source, future))
+                continue
+            try:
+                self.results.append(future.result())
+            except OSError as e:
+                self.errors.append((source, e))
+        self._futures = pending
+
+    def wait(self) -> list:
+        """Wait for every pending copy and return the copy results."""
+        self._collect()
+        return self.results
+
+    def close(self):
+        self.wait()
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
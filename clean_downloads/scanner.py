@@ -0,0 +1,87 @@
+import os
+import queue
+import threading
+from fnmatch import fnmatch
+
+_DONE = object()
+
+
+def _excluded(entry: os.DirEntry, root: str, patterns) -> bool:
+    relative = os.path.relpath(entry.path, root)
+    return any(fnmatch(entry.name, pattern) or fnmatch(relative, pattern) for pattern in patterns)
+
+
+def scan_files(root, max_depth: int = 0, exclude=(), root_exclude=()):
+    """Yield the DirEntry of every file under root, walking folders lazily with os.scandir.
+
+    max_depth 0 only looks at root itself. exclude are glob patterns matched
+    against the name and the path relative to root; root_exclude are folder
+    names skipped only at the top level (the category folders).
+    """
+    root = os.fspath(root)
+    stack = [(root, 0)]
+    while stack:
+        folder, depth = stack.pop()
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if exclude and _excluded(entry, root, exclude):
+                        continue
+                    try:
+                        # DirEntry caches the file type from readdir: no extra stat here
+                        if entry.is_dir(follow_symlinks=False):
+                            if depth < max_depth and not (depth == 0 and entry.name in root_exclude):
+                                stack.append((entry.path, depth + 1))
+                        elif entry.is_file():
+                            yield entry
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"Cannot read {folder}: {e}")
+
+
+def prefetch(iterable, size: int = 1024, chunk: int = 64):
+    """Run iterable in a background thread and yield its items through a bounded queue.
+
+    The consumer starts working on the first items while the producer is still
+    walking, and at most about size items wait in memory. Items travel in
+    chunks so the queue isn't locked once per file.
+    """
+    items = queue.Queue(maxsize=max(1, size // chunk))
+    stop = threading.Event()
+
+    def produce():
+        try:
+            batch = []
+            for item in iterable:
+                batch.append(item)
+                if len(batch) >= chunk:
+                    if stop.is_set():
+                        return
+                    items.put(batch)
+                    batch = []
+            if batch:
+                items.put(batch)
+        except BaseException as e:
+            items.put(e)
+        finally:
+            items.put(_DONE)
+
+    thread = threading.Thread(target=produce, name="scanner", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield from item
+    finally:
+        # Consumer stopped early: let the producer finish instead of blocking on put
+        stop.set()
+        while thread.is_alive():
+            try:
+                items.get(timeout=0.1)
+            except queue.Empty:
+                pass
@@ -0,0 +1,101 @@
+import os
+from collections import defaultdict
+from pathlib import Path
+
+from dedup import HashCache
+
+# Bytes read from the start of each file; enough for every signature below
+HEAD_SIZE = 512
+
+# (checks, extensions): checks are (offset, bytes) that must all match, offset None
+# meaning anywhere in the first HEAD_SIZE bytes. The first
+# extension is the one used when the file's own extension isn't in the list;
+# the others are formats sharing the signature (a .docx is a zip file).
+SIGNATURES = [
+    (((0, b"%PDF-"),), (".pdf",)),
+    (((0, b"\x89PNG\r\n\x1a\n"),), (".png",)),
+    (((0, b"\xff\xd8\xff"),), (".jpg", ".jpeg")),
+    (((0, b"GIF87a"),), (".gif",)),
+    (((0, b"GIF89a"),), (".gif",)),
+    (((0, b"RIFF"), (8, b"WEBP")), (".webp",)),
+    (((0, b"RIFF"), (8, b"WAVE")), (".wav",)),
+    (((0, b"RIFF"), (8, b"AVI ")), (".avi",)),
+    (((0, b"II*\x00"),), (".tiff",)),
+    (((0, b"MM\x00*"),), (".tiff",)),
+    (((0, b"PK\x03\x04"), (None, b"word/")), (".docx",)),
+    (((0, b"PK\x03\x04"), (None, b"xl/")), (".xlsx",)),
+    (((0, b"PK\x03\x04"), (None, b"ppt/")), (".pptx",)),
+    (((0, b"PK\x03\x04"),), (".zip", ".docx", ".xlsx", ".pptx", ".apk", ".jar", ".epub")),
+    (((0, b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"),), (".doc", ".xls", ".ppt", ".msi")),
+    (((0, b"Rar!\x1a\x07"),), (".rar",)),
+    (((0, b"7z\xbc\xaf\x27\x1c"),), (".7z",)),
+    (((0, b"\x1f\x8b\x08"),), (".gz",)),
+    (((257, b"ustar"),), (".tar",)),
+    (((0, b"ID3"),), (".mp3",)),
+    (((0, b"fLaC"),), (".flac",)),
+    (((0, b"OggS"),), (".ogg",)),
+    (((4, b"ftypqt"),), (".mov",)),
+    (((4, b"ftypM4A"),), (".m4a",)),
+    (((4, b"ftyp"),), (".mp4", ".m4a", ".mov")),
+    (((0, b"\x1a\x45\xdf\xa3"),), (".mkv",)),
+    (((0, b"\x7fELF"),), (".elf",)),
+    (((0, b"MZ"), (None, b"This program cannot be run in DOS mode")), (".exe",)),
+]
+
+
+def _build_index(signatures):
+    """Signatures starting at offset 0 grouped by their first byte; the rest checked always."""
+    by_first_byte = defaultdict(list)
+    anywhere = []
+    for checks, extensions in signatures:
+        offset, magic = checks[0]
+        if offset == 0:
+            by_first_byte[magic[0]].append((checks, extensions))
+        else:
+            anywhere.append((checks, extensions))
+    return dict(by_first_byte), anywhere
+
+
+_BY_FIRST_BYTE, _ANYWHERE = _build_index(SIGNATURES)
+
+
+def detect(head: bytes):
+    """Return the extensions matching the first bytes of a file, or None."""
+    if not head:
+        return None
+    for checks, extensions in _BY_FIRST_BYTE.get(head[0], []) + _ANYWHERE:
+        if all(magic in head if offset is None else head.startswith(magic, offset)
+               for offset, magic in checks):
+            return extensions
+    return None
+
+
+class ContentSniffer:
+    """Finds the real type of a file from its first bytes, remembering it between runs."""
+
+    def __init__(self, cache_path: Path):
+        self.cache = HashCache(cache_path)
+
+    def extension(self, path: Path, declared: str, stat: os.stat_result = None) -> str:
+        """The extension the content says the file has, or declared if it can't tell."""
+        try:
+            stat = stat or os.stat(path)
+        except OSError:
+            return declared
+        cached = self.cache.get(stat, "type")
+        if cached is None:
+            try:
+                with open(path, "rb") as f:
+                    extensions = detect(f.read(HEAD_SIZE))
+            except OSError:
+                return declared
+            # "" means "unknown": cached too, so the file is not opened again
+            cached = ",".join(extensions or ())
+            self.cache.set(stat, "type", cached)
+        if not cached:
+            return declared
+        extensions = cached.split(",")
+        return declared if declared in extensions else extensions[0]
+
+    def save(self):
+        self.cache.save()
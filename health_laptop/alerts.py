@@ -0,0 +1,175 @@
+import operator
+from collections import deque
+
+from history_query import parse_duration
+
+COMPARATORS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+
+class WindowedAggregate:
+    """Agregado sobre una ventana deslizante de tiempo, O(1) amortizado por muestra"""
+
+    def __init__(self, window, agg):
+        self.window = window
+        self.agg = agg
+        self.samples = deque()
+        self.count = 0
+        self.total = 0.0
+        self.extremes = deque()  # cola monótona para min/max
+        self.histogram = [0] * 101 if agg.startswith("p") else None
+
+    def add(self, timestamp, value):
+        self.count += 1
+        self.samples.append((timestamp, value, self.count))
+        self.total += value
+        if self.agg in ("max", "min"):
+            better = operator.ge if self.agg == "max" else operator.le
+            while self.extremes and better(value, self.extremes[-1][1]):
+                self.extremes.pop()
+            self.extremes.append((self.count, value))
+        if self.histogram is not None:
+            self.histogram[self._bin(value)] += 1
+        self._evict(timestamp)
+
+    def _evict(self, now):
+        limit = now - self.window
+        while self.samples and self.samples[0][0] < limit:
+            _, value, index = self.samples.popleft()
+            self.total -= value
+            if self.extremes and self.extremes[0][0] == index:
+                self.extremes.popleft()
+            if self.histogram is not None:
+                self.histogram[self._bin(value)] -= 1
+
+    @staticmethod
+    def _bin(value):
+        # Métricas en porcentaje: un contador por punto entero (memoria constante)
+        return max(0, min(100, int(round(value))))
+
+    def span(self):
+        """Tiempo cubierto por las muestras de la ventana"""
+        if not self.samples:
+            return 0
+        return self.samples[-1][0] - self.samples[0][0]
+
+    def value(self):
+        if not self.samples:
+            return None
+        if self.agg == "mean":
+            return self.total / len(self.samples)
+        if self.agg in ("max", "min"):
+            return self.extremes[0][1]
+        # Percentil sobre el histograma: 101 contadores, coste constante
+        rank = len(self.samples) * float(self.agg[1:]) / 100
+        seen = 0
+        for bucket, count in enumerate(self.histogram):
+            seen += count
+            if seen >= rank:
+                return bucket
+        return 100
+
+
+class AlertRule:
+    """Condición sostenida con histéresis y tiempo mínimo entre avisos"""
+
+    def __init__(self, name, metric, agg, op, threshold, window, clear=None, cooldown="10m",
+                 message=None, skip_zero=False):
+        self.name = name
+        self.metric = metric
+        self.compare = COMPARATORS[op]
+        self.op = op
+        self.threshold = threshold
+        self.clear = threshold if clear is None else clear
+        self.window = parse_duration(window)
+        self.cooldown = parse_duration(cooldown)
+        self.message = message or f"{metric} {agg} {op} {threshold}"
+        self.skip_zero = skip_zero
+        self.aggregate = WindowedAggregate(self.window, agg)
+        self.active = False
+        self.last_notified = None
+        self.value = None
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(**config)
+
+    def evaluate(self, timestamp, value):
+        """Añade la muestra; devuelve 'fired', 'resolved' o None"""
+        if value is None or (self.skip_zero and value == 0):
+            return None
+        self.aggregate.add(timestamp, value)
+        # Solo se juzga cuando la ventana está completa (condición sostenida)
+        if self.warming_up():
+            return None
+        self.value = self.aggregate.value()
+        if not self.active and self.compare(self.value, self.threshold):
+            self.active = True
+            if self.last_notified is None or timestamp - self.last_notified >= self.cooldown:
+                self.last_notified = timestamp
+                return "fired"
+            return None
+        # Histéresis: se desactiva al cruzar el umbral de recuperación
+        if self.active and not self.compare(self.value, self.clear):
+            self.active = False
+            return "resolved"
+        return None
+
+    def warming_up(self):
+        """La ventana aún no cubre el tiempo suficiente para juzgar la regla"""
+        return self.aggregate.span() < self.window * 0.9
+
+    def describe(self):
+        return f"{self.message} ({round(self.value, 1)})"
+
+
+class AlertEngine:
+    """Evalúa todas las reglas con cada muestra y agrupa los avisos"""
+
+    def __init__(self, rules, coalesce=60):
+        self.rules = rules
+        self.coalesce = parse_duration(coalesce)
+        self._pending = []
+        self._pending_since = None
+
+    def process(self, timestamp, values):
+        """Evalúa una muestra; devuelve los eventos generados"""
+        events = []
+        for rule in self.rules:
+            result = rule.evaluate(timestamp, values.get(rule.metric))
+            if result:
+                events.append((result, rule))
+                if result == "fired":
+                    if not self._pending:
+                        self._pending_since = timestamp
+                    self._pending.append(rule.describe())
+        return events
+
+    def active(self):
+        return [rule for rule in self.rules if rule.active]
+
+    def pop_batch(self, timestamp):
+        """Avisos acumulados cuando ha pasado la ventana de agrupación"""
+        if self._pending and timestamp - self._pending_since >= self.coalesce:
+            batch = self._pending
+            self._pending = []
+            self._pending_since = None
+            return batch
+        return []
+
+
+def default_rules(thresholds):
+    """Reglas equivalentes a los umbrales clásicos, pero sostenidas en el tiempo"""
+    return [
+        {"name": "cpu_high", "metric": "cpu", "agg": "mean", "op": ">",
+         "threshold": thresholds["cpu_warning"], "clear": thresholds["cpu_warning"] - 10,
+         "window": "2m", "cooldown": "10m", "message": "🔥 CPU alta sostenida"},
+        {"name": "ram_high", "metric": "ram", "agg": "p95", "op": ">",
+         "threshold": thresholds["ram_warning"], "clear": thresholds["ram_warning"] - 5,
+         "window": "10m", "cooldown": "30m", "message": "🧠 RAM alta sostenida"},
+        {"name": "disk_full", "metric": "disk", "agg": "min", "op": ">",
+         "threshold": thresholds["disk_warning"], "clear": thresholds["disk_warning"] - 2,
+         "window": "5m", "cooldown": "6h", "message": "💾 Disco lleno"},
+        {"name": "battery_low", "metric": "battery", "agg": "mean", "op": "<",
+         "threshold": thresholds["battery_low"], "clear": thresholds["battery_low"] + 5,
+         "window": "1m", "cooldown": "15m", "message": "🪫 Batería baja", "skip_zero": True},
+    ]
@@ -0,0 +1,261 @@
+import asyncio
+import json
+import operator
+import re
+import socket
+import threading
+import time
+from collections import deque
+from itertools import islice
+
+from ring_buffer import MetricRingBuffer
+
+# Orden de los campos de una muestra compacta
+SAMPLE_FIELDS = ("timestamp", "cpu", "ram", "disk", "battery", "battery_status")
+
+COMPARATORS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le, "==": operator.eq}
+
+QUERY_PATTERN = re.compile(r"^\s*(\w+)\s*(>=|<=|==|>|<)\s*([\d.]+)\s*$")
+
+
+def parse_address(text, default_port=9110):
+    """'host:puerto' o solo 'host' a una tupla (host, puerto)"""
+    host, sep, port = text.rpartition(":")
+    if not sep:
+        return text, default_port
+    return host or "0.0.0.0", int(port)
+
+
+def parse_query(text):
+    """'disk>90' a {"metric": "disk", "op": ">", "value": 90.0}"""
+    match = QUERY_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"Consulta no válida: {text!r} (ejemplo: disk>90)")
+    metric, op, value = match.groups()
+    return {"metric": metric, "op": op, "value": float(value)}
+
+
+def encode(message):
+    return (json.dumps(message, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+class FleetAgent:
+    """Envía muestras compactas por lotes a un colector, con búfer acotado"""
+
+    def __init__(self, address, host=None, batch_size=12, flush_interval=5,
+                 buffer_limit=5000, timeout=5, max_backoff=60):
+        self.address = address
+        self.host = host or socket.gethostname()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        # Si el colector no responde se descartan las muestras más antiguas
+        self.buffer = deque(maxlen=buffer_limit)
+        self.dropped = 0
+        self._sock = None
+        self._reader = None
+        self._backoff = 1
+        self._retry_at = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, sample):
+        """Encola una muestra (tupla en el orden de SAMPLE_FIELDS) y envía si toca"""
+        with self._lock:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped += 1
+            self.buffer.append(list(sample))
+            due = (len(self.buffer) >= self.batch_size
+                   or time.monotonic() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Envía todo el búfer en lotes; devuelve True si quedó vacío"""
+        if time.monotonic() < self._retry_at:
+            return False
+        self._last_flush = time.monotonic()
+        while True:
+            with self._lock:
+                batch = list(islice(self.buffer, self.batch_size * 10))
+            if not batch:
+                return True
+            try:
+                self._send(batch)
+            except (OSError, ValueError):
+                self._disconnect()
+                # Reintento con espera exponencial acotada
+                self._retry_at = time.monotonic() + self._backoff
+                self._backoff = min(self._backoff * 2, self.max_backoff)
+                return False
+            self._backoff = 1
+            with self._lock:
+                for _ in range(min(len(batch), len(self.buffer))):
+                    self.buffer.popleft()
+
+    def close(self):
+        self._disconnect()
+
+    def _send(self, batch):
+        if self._sock is None:
+            self._sock = socket.create_connection(self.address, timeout=self.timeout)
+            self._reader = self._sock.makefile("rb")
+        self._sock.sendall(encode({"type": "batch", "host": self.host, "samples": batch}))
+        # El colector confirma cada lote; sin confirmación se reenvía
+        reply = self._reader.readline()
+        if not reply:
+            raise OSError("Conexión cerrada por el colector")
+        if json.loads(reply).get("ok") != len(batch):
+            raise ValueError("Confirmación inesperada del colector")
+
+    def _disconnect(self):
+        if self._sock is not None:
+            try:
+                self._reader.close()
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._reader = None
+
+
+class FleetCollector:
+    """Recibe lotes de muchos agentes a la vez y guarda el historial por host"""
+
+    def __init__(self, host="127.0.0.1", port=9110, history_capacity=17280):
+        self.bind = (host, port)
+        self.history_capacity = history_capacity
+        self.history = {}
+        self.latest = {}
+        self.last_seen = {}
+        self._lock = threading.Lock()
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._error = None
+        self._writers = set()
+
+    @property
+    def address(self):
+        return self._server.sockets[0].getsockname()[:2]
+
+    def start(self):
+        """Arranca el servidor asyncio en un hilo propio"""
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="fleet-collector", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            # p. ej. puerto ocupado: se propaga en lugar de quedarse esperando
+            self._thread.join()
+            self._loop = None
+            raise self._error
+
+    def stop(self):
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(2)
+
+    def ingest(self, host, samples):
+        """Añade al historial del host las muestras de un lote"""
+        with self._lock:
+            buffer = self.history.get(host)
+            if buffer is None:
+                buffer = self.history[host] = MetricRingBuffer(self.history_capacity)
+            # Un lote reenviado (se perdió la confirmación) trae muestras ya guardadas:
+            # solo se aceptan timestamps crecientes para mantener el búfer ordenado
+            # (el búfer guarda milisegundos)
+            last = buffer.timestamp_at(len(buffer) - 1) if buffer else None
+            accepted = None
+            for sample in samples:
+                timestamp_ms = int(sample[0] * 1000)
+                if last is not None and timestamp_ms <= last:
+                    continue
+                buffer.append(*sample)
+                last = timestamp_ms
+                accepted = sample
+            if accepted is not None:
+                self.latest[host] = dict(zip(SAMPLE_FIELDS, accepted))
+                self.last_seen[host] = time.time()
+
+    def hosts(self):
+        """Última muestra de cada host"""
+        with self._lock:
+            return {host: {**sample, "last_seen": self.last_seen[host]}
+                    for host, sample in self.latest.items()}
+
+    def query_hosts(self, metric, op, value):
+        """Hosts cuya última muestra cumple la condición (p. ej. disk > 90)"""
+        if metric not in SAMPLE_FIELDS[1:5]:
+            raise ValueError(f"Métrica desconocida: {metric}")
+        compare = COMPARATORS[op]
+        with self._lock:
+            return sorted(
+                (host, sample[metric]) for host, sample in self.latest.items()
+                if compare(sample[metric], value)
+            )
+
+    def handle_message(self, message):
+        """Respuesta a un mensaje del protocolo (una línea JSON)"""
+        kind = message.get("type")
+        if kind == "batch":
+            self.ingest(message["host"], message["samples"])
+            return {"ok": len(message["samples"])}
+        if kind == "query":
+            return {"hosts": self.query_hosts(message["metric"], message["op"], message["value"])}
+        if kind == "hosts":
+            return {"hosts": self.hosts()}
+        return {"error": f"Tipo de mensaje desconocido: {kind}"}
+
+    async def _handle_client(self, reader, writer):
+        self._writers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    reply = self.handle_message(json.loads(line))
+                except (ValueError, KeyError, TypeError) as e:
+                    reply = {"error": str(e)}
+                writer.write(encode(reply))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle_client, *self.bind, limit=2 ** 24)
+            )
+        except Exception as e:
+            self._error = e
+            self._loop.close()
+            return
+        finally:
+            self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            # Cierra las conexiones de agentes aún abiertas y espera a sus tareas
+            for writer in list(self._writers):
+                writer.close()
+            tasks = asyncio.all_tasks(self._loop)
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+
+def fleet_request(address, message, timeout=5):
+    """Envía una consulta al colector y devuelve la respuesta"""
+    with socket.create_connection(address, timeout=timeout) as sock:
+        sock.sendall(encode(message))
+        with sock.makefile("rb") as reader:
+            return json.loads(reader.readline())
@@ -0,0 +1,151 @@
+import math
+from bisect import bisect_left
+from datetime import datetime
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_duration(text):
+    """Convierte '30s', '5m', '1h' o '2d' a segundos"""
+    if isinstance(text, (int, float)):
+        return text
+    return int(text[:-1]) * DURATION_UNITS[text[-1]]
+
+
+def to_seconds(value):
+    """Acepta datetime o segundos desde epoch"""
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return value
+
+
+class _SortedView:
+    """Secuencia de solo lectura para usar bisect sobre datos circulares"""
+
+    def __init__(self, length, getter):
+        self._length = length
+        self._getter = getter
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, i):
+        return self._getter(i)
+
+
+def find_range(buffer, start, end):
+    """Índices lógicos [lo, hi) de las muestras entre start y end, en O(log N)"""
+    view = _SortedView(len(buffer), buffer.timestamp_at)
+    lo = bisect_left(view, int(to_seconds(start) * 1000))
+    hi = bisect_left(view, int(to_seconds(end) * 1000), lo)
+    return lo, hi
+
+
+def percentile(sorted_values, p):
+    """Percentil con interpolación lineal sobre valores ya ordenados"""
+    if not sorted_values:
+        return None
+    pos = (len(sorted_values) - 1) * p / 100
+    low = math.floor(pos)
+    high = math.ceil(pos)
+    if low == high:
+        return sorted_values[low]
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (pos - low)
+
+
+def aggregate(values, agg):
+    """Aplica el agregado a una columna (array) completa"""
+    if not values:
+        return None
+    if agg == "mean":
+        return sum(values) / len(values)
+    if agg == "min":
+        return min(values)
+    if agg == "max":
+        return max(values)
+    if agg == "count":
+        return len(values)
+    if agg.startswith("p"):
+        return percentile(sorted(values), float(agg[1:]))
+    raise ValueError(f"Agregado no soportado: {agg}")
+
+
+def query(buffer, metric, start, end, agg="p95", bucket="5m"):
+    """Serie [(inicio_intervalo_s, valor)] de un agregado por intervalos"""
+    if metric not in buffer.columns:
+        raise ValueError(f"Métrica desconocida: {metric}")
+    width = parse_duration(bucket)
+    start_s = to_seconds(start)
+    end_s = to_seconds(end)
+
+    # Los agregados simples salen de los rollups sin recorrer todas las muestras
+    if agg in ("mean", "min", "max"):
+        for name in ("1h", "1m"):
+            rollup = buffer.rollups[name]
+            if width % rollup.width == 0 and len(rollup):
+                return _query_rollup(buffer, rollup, metric, start_s, end_s, agg, width)
+
+    lo, hi = find_range(buffer, start_s, end_s)
+    return [
+        (bucket_start, aggregate(values, agg))
+        for bucket_start, values in _buckets(buffer, metric, start_s, lo, hi, width)
+    ]
+
+
+def _buckets(buffer, metric, start_s, lo, hi, width):
+    """Genera (inicio_intervalo_s, columna) para las muestras [lo, hi)"""
+    view = _SortedView(len(buffer), buffer.timestamp_at)
+    bucket_start = math.floor(start_s / width) * width
+    while lo < hi:
+        bucket_end = bucket_start + width
+        split = bisect_left(view, int(bucket_end * 1000), lo, hi)
+        if split > lo:
+            yield bucket_start, buffer.column_slice(metric, lo, split)
+        lo = split
+        if lo < hi:
+            # Salta directamente al intervalo de la siguiente muestra
+            next_ts = buffer.timestamp_at(lo) / 1000
+            bucket_start = math.floor(next_ts / width) * width
+
+
+def _query_rollup(buffer, rollup, metric, start_s, end_s, agg, width):
+    # Solo los intervalos del rollup que caen enteros en [start, end); los
+    # extremos cubiertos en parte se calculan con las muestras
+    inner_start = max(math.ceil(start_s / rollup.width) * rollup.width, rollup.start_at(0))
+    inner_end = math.floor(end_s / rollup.width) * rollup.width
+    if inner_end <= inner_start:
+        inner_start = inner_end = start_s
+
+    accs = {}
+    for edge_start, edge_end in ((start_s, inner_start), (inner_end, end_s)):
+        lo, hi = find_range(buffer, edge_start, edge_end)
+        for bucket_start, values in _buckets(buffer, metric, edge_start, lo, hi, width):
+            _merge(accs, bucket_start, min(values), sum(values), len(values), max(values))
+
+    view = _SortedView(len(rollup), rollup.start_at)
+    first = bisect_left(view, inner_start)
+    last = bisect_left(view, inner_end, first)
+    for i in range(first, last):
+        row_start, count, values = rollup.row(i)
+        row_min, row_avg, row_max = values[metric]
+        _merge(accs, math.floor(row_start / width) * width, row_min, row_avg * count, count, row_max)
+    return [(bucket_start, _finish(acc, agg)) for bucket_start, acc in sorted(accs.items())]
+
+
+def _merge(accs, bucket_start, low, total, count, high):
+    acc = accs.get(bucket_start)
+    if acc is None:
+        accs[bucket_start] = [low, total, count, high]
+        return
+    acc[0] = min(acc[0], low)
+    acc[1] += total
+    acc[2] += count
+    acc[3] = max(acc[3], high)
+
+
+def _finish(acc, agg):
+    if agg == "min":
+        return acc[0]
+    if agg == "max":
+        return acc[3]
+    return acc[1] / acc[2]
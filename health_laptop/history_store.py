@@ -0,0 +1,124 @@
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+
+class HistoryStore:
+    """Historial de métricas en segmentos JSONL diarios de solo añadir"""
+
+    def __init__(self, directory, retention_days=30, fsync_every=20, fsync_interval=30):
+        self.directory = directory
+        self.retention_days = retention_days
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._file = None
+        self._day = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def segment_path(self, day):
+        """Ruta del segmento de un día (YYYY-MM-DD)"""
+        return os.path.join(self.directory, f"{day}.jsonl")
+
+    def segments(self):
+        """Días con segmento en disco, ordenados"""
+        return sorted(
+            name[:-len(".jsonl")] for name in os.listdir(self.directory)
+            if name.endswith(".jsonl")
+        )
+
+    def append(self, entry):
+        """Añade una muestra en O(1): una línea al segmento del día"""
+        day = entry["timestamp"][:10]
+        if day != self._day:
+            self._rotate(day)
+        self._file.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._unsynced += 1
+
+        # fsync por lotes: cada N muestras o cada cierto tiempo
+        if (self._unsynced >= self.fsync_every
+                or time.monotonic() - self._last_sync >= self.fsync_interval):
+            self.flush()
+
+    def flush(self):
+        """Vuelca a disco las muestras pendientes"""
+        if self._file and self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        """Cierra el segmento actual"""
+        if self._file:
+            self.flush()
+            self._file.close()
+            self._file = None
+            self._day = None
+
+    def prune(self, now=None):
+        """Elimina los segmentos completos fuera del periodo de retención"""
+        cutoff = ((now or datetime.now()) - timedelta(days=self.retention_days)).strftime("%Y-%m-%d")
+        for day in self.segments():
+            if day >= cutoff:
+                break
+            if day != self._day:
+                os.remove(self.segment_path(day))
+
+    def load(self):
+        """Genera las muestras de los segmentos vigentes una a una (sin lista intermedia)"""
+        self.prune()
+        for day in self.segments():
+            # En binario: un corte a mitad de un carácter UTF-8 (emoji del estado de
+            # batería) no debe romper la lectura de todo el segmento
+            with open(self.segment_path(day), 'rb') as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # Línea incompleta tras un cierre inesperado (incluye UnicodeDecodeError)
+                        continue
+
+    def migrate_legacy(self, json_path):
+        """Convierte una sola vez el antiguo health_history.json a segmentos"""
+        if not os.path.exists(json_path):
+            return False
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                legacy = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        by_day = {}
+        for entry in legacy:
+            by_day.setdefault(entry["timestamp"][:10], []).append(entry)
+        for day, entries in by_day.items():
+            with open(self.segment_path(day), 'a', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+        os.replace(json_path, json_path + ".migrated")
+        return True
+
+    def _rotate(self, day):
+        self.close()
+        self._day = day
+        path = self.segment_path(day)
+        self._file = open(path, 'a', encoding='utf-8')
+        if not self._ends_with_newline(path):
+            # La primera muestra tras un cierre inesperado va en su propia línea
+            self._file.write("\n")
+        self.prune()
+
+    @staticmethod
+    def _ends_with_newline(path):
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if not f.tell():
+                return True
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
@@ -0,0 +1,128 @@
+import contextlib
+import functools
+import os
+import time
+
+# Límites superiores de los buckets en microsegundos: 1, 2, 4, ... ~67 s
+BUCKET_BOUNDS_US = [2 ** i for i in range(27)]
+
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+class LatencyHistogram:
+    """Histograma logarítmico de duraciones: memoria fija y registro O(1)"""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS_US) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        micros = int(seconds * 1_000_000)
+        # bit_length da directamente el bucket potencia de 2
+        self.counts[min(micros.bit_length(), len(BUCKET_BOUNDS_US))] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """Cota superior (segundos) del bucket que contiene el cuantil q"""
+        if not self.count:
+            return None
+        rank = self.count * q
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                if i >= len(BUCKET_BOUNDS_US):
+                    return self.max
+                return min(BUCKET_BOUNDS_US[i] / 1_000_000, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+        }
+
+
+class Instrumentation:
+    """Tiempos por colector y paso de pintado; sin coste apreciable si está desactivada"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.histograms = {}
+        self._process = None
+        self._started = time.monotonic()
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+        return histogram
+
+    def wrap(self, name, func):
+        """Devuelve func cronometrada, o func tal cual si está desactivada"""
+        if not self.enabled:
+            return func
+        histogram = self.histogram(name)
+
+        @functools.wraps(func)
+        def timed_call(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.record(time.perf_counter() - start)
+
+        return timed_call
+
+    def timed(self, name):
+        """Context manager para cronometrar un bloque"""
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return _Timer(self.histogram(name))
+
+    def self_usage(self):
+        """CPU y memoria del propio monitor"""
+        import psutil
+
+        if self._process is None:
+            self._process = psutil.Process(os.getpid())
+            self._process.cpu_percent(interval=None)
+        with self._process.oneshot():
+            return {
+                "cpu_percent": self._process.cpu_percent(interval=None),
+                "rss": self._process.memory_info().rss,
+                "threads": self._process.num_threads(),
+                "uptime": round(time.monotonic() - self._started, 1),
+            }
+
+    def summary(self):
+        """Histogramas resumidos y uso propio, listo para la instantánea"""
+        return {
+            "timings": {name: h.summary() for name, h in sorted(self.histograms.items())},
+            "self": self.self_usage(),
+        }
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.record(time.perf_counter() - self.start)
+        return False
@@ -1,19 +1,49 @@
+import argparse
+import atexit
 import psutil
-import tkinter as tk
-import socket
-from tkinter import ttk
-from plyer import notification
 import json
 import os
+import tempfile
 from datetime import datetime, timedelta
 import time
 
+# Solo módulos ligeros al inicio; asyncio, http.server, plyer y tkinter
+# se importan en el modo que los usa para que --once arranque rápido
+import history_query
+from alerts import AlertEngine, AlertRule, default_rules
+from history_store import HistoryStore
+from instrumentation import Instrumentation
+from process_collector import ProcessCollector
+from ring_buffer import MetricRingBuffer
+from sampler import Sampler
+
+# tkinter se importa solo al abrir la ventana (no existe en servidores sin pantalla)
+tk = None
+ttk = None
+
+
+def load_gui():
+    """Importa tkinter bajo demanda"""
+    global tk, ttk
+    if tk is None:
+        import tkinter
+        from tkinter import ttk as tkinter_ttk
+        tk = tkinter
+        ttk = tkinter_ttk
+
 class LaptopHealthMonitor:
-    def __init__(self):
+    def __init__(self, one_shot=False, diagnostics=False):
         self.config_file = "health_config.json"
         self.history_file = "health_history.json"
+        self.history_dir = "health_history"
+        self.once_cache_file = os.path.join(tempfile.gettempdir(), "laptop_health_once.json")
         self.config = self.load_config()
-        self.load_history()
+        self.instruments = Instrumentation(enabled=diagnostics or self.config["instrumentation"])
+        self._last_net = None
+        # El modo --once no necesita historial ni hilos de muestreo
+        if not one_shot:
+            self.load_history()
+            self.setup_sampler()
     
     def load_config(self):
         """Carga configuración personalizable"""
@@ -26,7 +56,45 @@ class LaptopHealthMonitor:
             },
             "notifications": True,
             "auto_refresh": True,
-            "refresh_interval": 5000  # milliseconds
+            "refresh_interval": 5000,  # milliseconds
+            # Segundos entre muestras de cada colector
+            "sample_intervals": {
+                "cpu": 1,
+                "ram": 2,
+                "disk": 30,
+                "battery": 10,
+                "temperature": 5,
+                "network": 1,
+                "latency": 10,
+                "processes": 5,
+                "alerts": 1,
+                "diagnostics": 5
+            },
+            "sample_ready_timeout": 3,  # seconds
+            # Destinos TCP medidos en paralelo y tamaño de la ventana de estadísticas
+            "latency_targets": ["8.8.8.8:53", "1.1.1.1:53"],
+            "latency_timeout": 2,  # seconds
+            "latency_window": 60,
+            "top_processes": 5,
+            # Reglas sostenidas (None = derivadas de thresholds) y agrupación de avisos
+            "alert_rules": None,
+            "alert_coalesce": 60,  # seconds
+            # Histogramas de tiempos por colector y paso de pintado (--diagnostics)
+            "instrumentation": False,
+            # Modo flota: tamaño de lote, envío periódico, búfer sin conexión e historial por host
+            "fleet_batch_size": 12,
+            "fleet_flush_interval": 60,  # seconds
+            "fleet_buffer_limit": 5000,
+            "fleet_history_capacity": 24 * 3600 // 5,
+            "history_retention_days": 30,
+            # Muestras en memoria (30 días cada 5 s)
+            "history_capacity": 30 * 24 * 3600 // 5,
+            # Endpoint HTTP del modo --headless
+            "http_host": "127.0.0.1",
+            "http_port": 9108,
+            # Modo --once: reutiliza el delta de la ejecución anterior si es reciente
+            "once_cache_max_age": 300,  # seconds
+            "once_min_interval": 0.05  # seconds
         }
         
         if os.path.exists(self.config_file):
@@ -43,19 +111,33 @@ class LaptopHealthMonitor:
             json.dump(self.config, f, indent=4)
     
     def load_history(self):
-        """Carga historial de métricas"""
-        self.history = []
-        if os.path.exists(self.history_file):
-            try:
-                with open(self.history_file, 'r') as f:
-                    self.history = json.load(f)
-            except:
-                self.history = []
+        """Carga historial de métricas (migra el JSON antiguo una sola vez)"""
+        self.history = MetricRingBuffer(self.config["history_capacity"])
+        self.history_store = HistoryStore(
+            self.history_dir, retention_days=self.config["history_retention_days"]
+        )
+        atexit.register(self.history_store.close)
+        try:
+            self.history_store.migrate_legacy(self.history_file)
+            for entry in self.history_store.load():
+                try:
+                    # Único punto donde se interpreta el ISO: al cargar desde disco
+                    self.history.append(
+                        datetime.fromisoformat(entry["timestamp"]).timestamp(),
+                        entry["cpu"], entry["ram"], entry["disk"],
+                        entry["battery"], entry["battery_status"]
+                    )
+                except (KeyError, ValueError, TypeError):
+                    # Una muestra dañada no descarta el resto del historial
+                    continue
+        except OSError:
+            pass
     
     def save_to_history(self, stats):
         """Guarda métricas actuales al historial"""
+        now = datetime.now()
         entry = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now.isoformat(),
             "cpu": stats[0],
             "ram": stats[1],
             "disk": stats[2],
@@ -63,53 +145,121 @@ class LaptopHealthMonitor:
             "battery_status": stats[4]
         }
         
-        self.history.append(entry)
+        self.history.append(now.timestamp(), *stats[:5])
+        self.history_store.append(entry)
         
         # Mantener solo últimos 30 días
-        cutoff_date = datetime.now() - timedelta(days=30)
-        self.history = [h for h in self.history if datetime.fromisoformat(h["timestamp"]) > cutoff_date]
+        cutoff = now - timedelta(days=self.config["history_retention_days"])
+        self.history.discard_older_than(cutoff.timestamp())
+
+    def setup_sampler(self):
+        """Registra los colectores, cada uno con su propio intervalo"""
+        from latency_prober import LatencyProber
         
-        with open(self.history_file, 'w') as f:
-            json.dump(self.history, f, indent=2)
+        intervals = self.config["sample_intervals"]
+        self.sampler = Sampler()
+        self.process_collector = ProcessCollector(top_n=self.config["top_processes"])
+        rules = self.config["alert_rules"] or default_rules(self.config["thresholds"])
+        self.alert_engine = AlertEngine(
+            [AlertRule.from_config(rule) for rule in rules],
+            coalesce=self.config["alert_coalesce"]
+        )
+        
+        collectors = [
+            ("cpu", self.collect_cpu),
+            ("ram", self.collect_ram),
+            ("disk", self.collect_disk),
+            ("battery", self.collect_battery),
+            ("temperature", self.collect_temperature),
+            ("network", self.collect_network_io),
+            ("latency", self.collect_latency),
+            ("processes", self.process_collector.collect),
+            ("alerts", self.collect_alerts),
+        ]
+        if self.instruments.enabled:
+            collectors.append(("diagnostics", self.collect_diagnostics))
+        for name, func in collectors:
+            # Con la instrumentación desactivada wrap devuelve la función sin envolver
+            self.sampler.add_collector(name, self.instruments.wrap(f"collector.{name}", func), intervals[name])
+        
+        self.latency_prober = LatencyProber(
+            self.config["latency_targets"],
+            interval=intervals["latency"],
+            timeout=self.config["latency_timeout"],
+            window=self.config["latency_window"]
+        )
+
+    def collect_diagnostics(self):
+        """Tiempos de colectores y pintado, y consumo del propio monitor"""
+        return {"diagnostics": self.instruments.summary()}
+
+    def start_sampling(self):
+        """Arranca el muestreo en segundo plano si no está activo"""
+        if not self.sampler.running:
+            # Primera llamada no bloqueante: fija la referencia para cpu_percent
+            psutil.cpu_percent(interval=None)
+            self.latency_prober.start()
+            self.sampler.start()
 
     def get_system_stats(self):
-        """Obtener estadísticas del sistema con manejo de errores mejorado"""
+        """Obtener estadísticas del sistema desde la última instantánea"""
+        self.start_sampling()
+        # Solo la primera lectura espera (acotada) a que haya datos
+        self.sampler.wait_ready(timeout=self.config["sample_ready_timeout"])
+        return self.stats_from_snapshot(self.sampler.snapshot())
+
+    def stats_from_snapshot(self, snapshot):
+        """Convierte una instantánea en la tupla que usan la ventana y las notificaciones"""
+        values = snapshot.values
+        network = {**values.get("net_io", {}), **values.get("latency", {})}
+        return (
+            values.get("cpu", 0),
+            values.get("ram", 0),
+            values.get("disk", 0),
+            values.get("battery", 0),
+            values.get("battery_status", "❓ No disponible"),
+            values.get("temps", {}),
+            network,
+        )
+
+    def collect_cpu(self):
+        """Uso de CPU desde la muestra anterior (sin dormir)"""
+        return {"cpu": psutil.cpu_percent(interval=None)}
+
+    def collect_ram(self):
+        """Uso de memoria RAM"""
+        return {"ram": psutil.virtual_memory().percent}
+
+    def collect_disk(self):
+        """Uso de disco con manejo multiplataforma"""
         try:
-            cpu = psutil.cpu_percent(interval=1)
-            ram = psutil.virtual_memory().percent
-            
-            # Manejo multiplataforma para disco
-            try:
-                if os.name == 'nt':  # Windows
-                    disk = psutil.disk_usage('C:\\').percent
-                else:  # Unix/Linux/Mac
-                    disk = psutil.disk_usage('/').percent
-            except:
-                disk = 0
-            
-            # Información de batería con mejor manejo de errores
-            try:
-                battery_info = psutil.sensors_battery()
-                if battery_info:
-                    battery = battery_info.percent
-                    status = "🔌 Cargando" if battery_info.power_plugged else "🔋 Desconectado"
-                else:
-                    battery = 0
-                    status = "🖥️ PC de Escritorio"
-            except:
+            if os.name == 'nt':  # Windows
+                disk = psutil.disk_usage('C:\\').percent
+            else:  # Unix/Linux/Mac
+                disk = psutil.disk_usage('/').percent
+        except:
+            disk = 0
+        return {"disk": disk}
+
+    def collect_battery(self):
+        """Información de batería con mejor manejo de errores"""
+        try:
+            battery_info = psutil.sensors_battery()
+            if battery_info:
+                battery = battery_info.percent
+                status = "🔌 Cargando" if battery_info.power_plugged else "🔋 Desconectado"
+            else:
                 battery = 0
-                status = "❓ No disponible"
-            
-            # Información adicional
-            temps = self.get_temperature()
-            network = self.get_network_stats()
-            
-            return cpu, ram, disk, battery, status, temps, network
-        
-        except Exception as e:
-            print(f"Error obteniendo estadísticas: {e}")
-            return 0, 0, 0, 0, "Error", {}, {}
-    
+                status = "🖥️ PC de Escritorio"
+        except:
+            battery = 0
+            status = "❓ No disponible"
+        return {"battery": battery, "battery_status": status}
+
+    def collect_temperature(self):
+        """Temperaturas medias por sensor"""
+        return {"temps": self.get_temperature()}
+
     def get_temperature(self):
         """Obtiene temperatura del sistema (si está disponible)"""
         try:
@@ -124,46 +274,65 @@ class LaptopHealthMonitor:
         except:
             pass
         return {}
-    
-    def get_network_stats(self):
-        """Obtiene estadísticas de red más completas"""
-        net_info = {}
+
+    def collect_network_io(self):
+        """Bytes totales y velocidad calculada con el delta entre muestras"""
         try:
-            # Bytes totales enviados/recibidos
             net = psutil.net_io_counters()
-            net_info["bytes_sent"] = self.format_bytes(net.bytes_sent)
-            net_info["bytes_recv"] = self.format_bytes(net.bytes_recv)
-
-            # Velocidad de subida/bajada (instantánea)
-            net1 = psutil.net_io_counters()
-            time.sleep(1)
-            net2 = psutil.net_io_counters()
-            net_info["upload_speed"] = self.format_bytes(net2.bytes_sent - net1.bytes_sent) + "/s"
-            net_info["download_speed"] = self.format_bytes(net2.bytes_recv - net1.bytes_recv) + "/s"
+            now = time.monotonic()
+            net_info = {
+                "bytes_sent": self.format_bytes(net.bytes_sent),
+                "bytes_recv": self.format_bytes(net.bytes_recv),
+                "bytes_sent_total": net.bytes_sent,
+                "bytes_recv_total": net.bytes_recv,
+            }
 
-            # Ping a Google DNS
-            try:
-                start = time.time()
-                socket.create_connection(("8.8.8.8", 53), timeout=2)
-                latency = round((time.time() - start) * 1000)  # ms
-                net_info["latency"] = f"{latency} ms"
-                net_info["status"] = "Buena conexión" if latency < 100 else "Conexión lenta"
-            except:
-                net_info["latency"] = "N/A"
-                net_info["status"] = "Sin conexión"
-            
-        except Exception as e:
+            # Velocidad de subida/bajada respecto a la muestra anterior
+            last = self._last_net
+            self._last_net = (now, net.bytes_sent, net.bytes_recv)
+            if last and now > last[0]:
+                elapsed = now - last[0]
+                net_info["upload_bps"] = round((net.bytes_sent - last[1]) / elapsed, 1)
+                net_info["download_bps"] = round((net.bytes_recv - last[2]) / elapsed, 1)
+                net_info["upload_speed"] = self.format_bytes(net_info["upload_bps"]) + "/s"
+                net_info["download_speed"] = self.format_bytes(net_info["download_bps"]) + "/s"
+            else:
+                net_info["upload_speed"] = "N/A"
+                net_info["download_speed"] = "N/A"
+        except Exception:
             net_info = {
                 "bytes_sent": "N/A",
                 "bytes_recv": "N/A",
                 "upload_speed": "N/A",
                 "download_speed": "N/A",
-                "latency": "N/A",
-                "status": "Error"
             }
-        
-        return net_info
-    
+        return {"net_io": net_info}
+
+    def collect_latency(self):
+        """Resumen de latencia de todos los destinos (los mide el prober asyncio)"""
+        targets = self.latency_prober.stats()
+        measured = [t for t in targets.values() if t["median"] is not None]
+        if measured:
+            # La mejor ruta decide el estado; el resto se muestra por destino
+            best = min(measured, key=lambda t: t["median"])
+            latency = best["median"]
+            net_info = {
+                "latency_ms": latency,
+                "latency": f"{round(latency)} ms (p99 {round(best['p99'])} ms)",
+                "loss": best["loss"],
+                "status": "Buena conexión" if latency < 100 and best["loss"] < 0.05 else "Conexión lenta",
+            }
+        elif any(t["count"] for t in targets.values()):
+            net_info = {"latency_ms": None, "latency": "N/A", "loss": 1.0, "status": "Sin conexión"}
+        else:
+            net_info = {"latency_ms": None, "latency": "N/A", "loss": None, "status": "Midiendo..."}
+        net_info["targets"] = targets
+        return {"latency": net_info}
+
+    def get_network_stats(self):
+        """Obtiene estadísticas de red desde la última instantánea"""
+        return self.get_system_stats()[6]
+
     def format_bytes(self, bytes_value):
         """Convierte bytes a formato legible"""
         for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
@@ -176,17 +345,38 @@ class LaptopHealthMonitor:
         """Determina el estado general de salud"""
         issues = []
         
-        if cpu > self.config["thresholds"]["cpu_warning"]:
-            issues.append(f"🔥 CPU alta ({cpu}%)")
-        
-        if ram > self.config["thresholds"]["ram_warning"]:
-            issues.append(f"🧠 RAM alta ({ram}%)")
-        
-        if disk > self.config["thresholds"]["disk_warning"]:
-            issues.append(f"💾 Disco lleno ({disk}%)")
-        
-        if battery < self.config["thresholds"]["battery_low"] and battery > 0:
-            issues.append(f"🪫 Batería baja ({battery}%)")
+        engine = getattr(self, "alert_engine", None)
+        if engine is not None and self.sampler.running:
+            # Con muestreo continuo mandan las reglas sostenidas; mientras la ventana
+            # de una regla no está completa se usa la lectura puntual
+            process_metric = {"cpu": "cpu", "ram": "rss"}
+            readings = {"cpu": cpu, "ram": ram, "disk": disk, "battery": battery}
+            instant_labels = {"cpu": "🔥 CPU alta", "ram": "🧠 RAM alta",
+                              "disk": "💾 Disco lleno", "battery": "🪫 Batería baja"}
+            for rule in engine.rules:
+                if rule.active:
+                    description = rule.describe()
+                elif rule.warming_up() and rule.metric in readings:
+                    value = readings[rule.metric]
+                    if (rule.skip_zero and value == 0) or not rule.compare(value, rule.threshold):
+                        continue
+                    description = f"{instant_labels[rule.metric]} ({value}%)"
+                else:
+                    continue
+                hint = self.top_process_hint(process_metric[rule.metric]) if rule.metric in process_metric else ""
+                issues.append(description + hint)
+        else:
+            if cpu > self.config["thresholds"]["cpu_warning"]:
+                issues.append(f"🔥 CPU alta ({cpu}%)" + self.top_process_hint("cpu"))
+            
+            if ram > self.config["thresholds"]["ram_warning"]:
+                issues.append(f"🧠 RAM alta ({ram}%)" + self.top_process_hint("rss"))
+            
+            if disk > self.config["thresholds"]["disk_warning"]:
+                issues.append(f"💾 Disco lleno ({disk}%)")
+            
+            if battery < self.config["thresholds"]["battery_low"] and battery > 0:
+                issues.append(f"🪫 Batería baja ({battery}%)")
         
         if not issues:
             return "✅ Excelente", "#4caf50"
@@ -195,11 +385,50 @@ class LaptopHealthMonitor:
         else:
             return f"🚨 {len(issues)} problemas detectados", "#f44336"
 
+    def collect_alerts(self):
+        """Evalúa las reglas sobre la última instantánea y envía los avisos agrupados"""
+        now = time.time()
+        self.alert_engine.process(now, self.sampler.snapshot().values)
+        batch = self.alert_engine.pop_batch(now)
+        if batch:
+            self.send_alert_notification(batch)
+        return {"alerts": [
+            {"name": rule.name, "message": rule.describe(), "value": round(rule.value, 1)}
+            for rule in self.alert_engine.active()
+        ]}
+
+    def send_alert_notification(self, batch):
+        """Una sola notificación con todos los avisos acumulados"""
+        if not self.config["notifications"]:
+            return
+        try:
+            from plyer import notification
+            notification.notify(
+                title=f"💻 {len(batch)} aviso(s) de salud",
+                message="\n".join(batch),
+                timeout=15
+            )
+        except Exception as e:
+            # Sin escritorio (p. ej. --headless) no hay dónde mostrarla
+            print(f"Avisos de salud: {'; '.join(batch)} ({e})")
+
+    def top_process_hint(self, metric):
+        """Nombre del proceso que más consume según la última muestra, si la hay"""
+        sampler = getattr(self, "sampler", None)
+        if sampler is None:
+            return ""
+        top = sampler.snapshot().values.get("processes", {}).get(metric)
+        if not top:
+            return ""
+        return f" - {top[0]['name']} (PID {top[0]['pid']})"
+
     def send_popup(self, cpu, ram, disk, battery, status):
         """Enviar notificación con información de salud mejorada"""
         if not self.config["notifications"]:
             return
         
+        from plyer import notification
+        
         health_status, _ = self.get_health_status(cpu, ram, disk, battery)
         
         message = f"""Estado: {health_status}
@@ -215,9 +444,27 @@ Estado: {status}"""
         )
 
     def create_modern_window(self, stats):
-        """Crear ventana moderna con más funcionalidades"""
-        cpu, ram, disk, battery, status, temps, network = stats
+        """Crear la ventana una sola vez; las actualizaciones solo modifican sus widgets"""
+        load_gui()
+        with self.instruments.timed("render.build_window"):
+            self.build_window()
+        
+        with self.instruments.timed("render.update_window"):
+            self.update_window(stats)
+        self.rendered["seq"] = self.sampler.snapshot().seq
         
+        # Guardar estadísticas al historial
+        with self.instruments.timed("history.save"):
+            self.save_to_history(stats)
+        
+        # Auto-refresh si está habilitado
+        if self.config["auto_refresh"]:
+            self.window.after(self.config["refresh_interval"], self.auto_refresh)
+        
+        self.window.mainloop()
+    
+    def build_window(self):
+        """Crea todos los widgets y guarda sus referencias"""
         self.window = tk.Tk()
         self.window.title("🖥️ Monitor de Salud - Laptop")
         self.window.geometry("500x700")
@@ -227,6 +474,10 @@ Estado: {status}"""
         # Configurar estilo una sola vez
         self.setup_styles()
         
+        # Referencias a los widgets y últimos valores pintados
+        self.widgets = {}
+        self.rendered = {}
+        
         # Scrollable frame
         canvas = tk.Canvas(self.window, bg="#0d1117", highlightthickness=0)
         scrollbar = ttk.Scrollbar(self.window, orient="vertical", command=canvas.yview)
@@ -241,72 +492,72 @@ Estado: {status}"""
         canvas.configure(yscrollcommand=scrollbar.set)
         
         # Header con estado de salud
-        health_status, health_color = self.get_health_status(cpu, ram, disk, battery)
         header_frame = tk.Frame(scrollable_frame, bg="#0d1117")
         header_frame.pack(fill="x", padx=20, pady=10)
         
         tk.Label(header_frame, text="🖥️ Monitor de Salud", 
                 font=("Segoe UI", 18, "bold"), bg="#0d1117", fg="#f0f6fc").pack()
         
-        tk.Label(header_frame, text=health_status, 
-                font=("Segoe UI", 14), bg="#0d1117", fg=health_color).pack(pady=5)
+        self.widgets["health"] = tk.Label(header_frame, font=("Segoe UI", 14), bg="#0d1117")
+        self.widgets["health"].pack(pady=5)
         
-        tk.Label(header_frame, text=f"Actualizado: {datetime.now().strftime('%H:%M:%S')}", 
-                font=("Segoe UI", 10), bg="#0d1117", fg="#8b949e").pack()
+        self.widgets["updated"] = tk.Label(header_frame, font=("Segoe UI", 10), 
+                                          bg="#0d1117", fg="#8b949e")
+        self.widgets["updated"].pack()
         
         # Métricas principales
         metrics_frame = tk.Frame(scrollable_frame, bg="#0d1117")
         metrics_frame.pack(fill="x", padx=20, pady=10)
         
         metrics = [
-            ("CPU", cpu, "#ff6b6b", "🔥"),
-            ("RAM", ram, "#4ecdc4", "🧠"), 
-            ("Disco", disk, "#ffd93d", "💾"),
-            ("Batería", battery, "#1fa2ff", "🔋")
+            ("CPU", "#ff6b6b", "🔥"),
+            ("RAM", "#4ecdc4", "🧠"), 
+            ("Disco", "#ffd93d", "💾"),
+            ("Batería", "#1fa2ff", "🔋")
         ]
         
-        for i, (name, value, color, icon) in enumerate(metrics):
-            self.create_metric_widget(metrics_frame, name, value, color, icon, i)
+        self.metric_widgets = []
+        for i, (name, color, icon) in enumerate(metrics):
+            self.metric_widgets.append(self.create_metric_widget(metrics_frame, name, color, icon, i))
         
-        # Información adicional
-        if status != "🖥️ PC de Escritorio":
-            info_frame = tk.Frame(scrollable_frame, bg="#161b22", relief="raised", bd=1)
-            info_frame.pack(fill="x", padx=20, pady=5)
-            tk.Label(info_frame, text=f"Estado Batería: {status}", 
-                    font=("Segoe UI", 11), bg="#161b22", fg="#f0f6fc").pack(pady=5)
+        # Información adicional (se muestra u oculta según el estado)
+        self.widgets["battery_frame"] = tk.Frame(scrollable_frame, bg="#161b22", relief="raised", bd=1)
+        self.widgets["battery_status"] = tk.Label(self.widgets["battery_frame"], 
+                                                 font=("Segoe UI", 11), bg="#161b22", fg="#f0f6fc")
+        self.widgets["battery_status"].pack(pady=5)
         
-        # Temperaturas (si están disponibles)
-        if temps:
-            temp_frame = tk.LabelFrame(scrollable_frame, text="🌡️ Temperaturas", 
-                                     bg="#0d1117", fg="#f0f6fc", font=("Segoe UI", 12, "bold"))
-            temp_frame.pack(fill="x", padx=20, pady=5)
-            
-            for sensor, temp in temps.items():
-                color = "#4caf50" if temp < 70 else "#ff9800" if temp < 80 else "#f44336"
-                tk.Label(temp_frame, text=f"{sensor}: {temp}°C", 
-                        font=("Segoe UI", 10), bg="#0d1117", fg=color).pack(pady=2)
+        # Temperaturas: una etiqueta por sensor, creada la primera vez que aparece
+        self.widgets["temp_frame"] = tk.LabelFrame(scrollable_frame, text="🌡️ Temperaturas", 
+                                                  bg="#0d1117", fg="#f0f6fc", font=("Segoe UI", 12, "bold"))
+        self.temp_labels = {}
         
-        # Red (si está disponible)
-        if network:
-            net_frame = tk.LabelFrame(scrollable_frame, text="🌐 Red", 
-                                    bg="#0d1117", fg="#f0f6fc", font=("Segoe UI", 12, "bold"))
-            net_frame.pack(fill="x", padx=20, pady=5)
-
-            tk.Label(net_frame, text=f"Enviado: {network.get('bytes_sent','N/A')}", font=("Segoe UI", 10),
-                    bg="#0d1117", fg="#f0f6fc").pack(pady=2)
-            tk.Label(net_frame, text=f"Recibido: {network.get('bytes_recv','N/A')}", font=("Segoe UI", 10),
-                    bg="#0d1117", fg="#f0f6fc").pack(pady=2)
-            tk.Label(net_frame, text=f"Velocidad subida: {network.get('upload_speed','N/A')}", font=("Segoe UI", 10),
-                    bg="#0d1117", fg="#f0f6fc").pack(pady=2)
-            tk.Label(net_frame, text=f"Velocidad bajada: {network.get('download_speed','N/A')}", font=("Segoe UI", 10),
-                    bg="#0d1117", fg="#f0f6fc").pack(pady=2)
-            tk.Label(net_frame, text=f"Latencia: {network.get('latency','N/A')}", font=("Segoe UI", 10),
-                    bg="#0d1117", fg="#f0f6fc").pack(pady=2)
-            tk.Label(net_frame, text=f"Estado: {network.get('status','N/A')}", font=("Segoe UI", 10, "bold"),
-                    bg="#0d1117", fg="#4caf50" if network.get('status')=="Buena conexión" else "#ff9800").pack(pady=2)
+        # Red
+        net_frame = tk.LabelFrame(scrollable_frame, text="🌐 Red", 
+                                bg="#0d1117", fg="#f0f6fc", font=("Segoe UI", 12, "bold"))
+        self.widgets["net_frame"] = net_frame
+        self.net_labels = {}
+        for key in ("bytes_sent", "bytes_recv", "upload_speed", "download_speed", "latency", "status", "targets"):
+            font = ("Segoe UI", 10, "bold") if key == "status" else ("Segoe UI", 10)
+            label = tk.Label(net_frame, font=font, bg="#0d1117", fg="#f0f6fc", justify="left")
+            label.pack(pady=2)
+            self.net_labels[key] = label
+        
+        # Procesos que más consumen
+        self.widgets["proc_frame"] = tk.LabelFrame(scrollable_frame, text="⚙️ Procesos", 
+                                                  bg="#0d1117", fg="#f0f6fc", font=("Segoe UI", 12, "bold"))
+        self.widgets["processes"] = tk.Label(self.widgets["proc_frame"], font=("Courier", 9), 
+                                            bg="#0d1117", fg="#f0f6fc", justify="left")
+        self.widgets["processes"].pack(pady=2, anchor="w", padx=5)
+        
+        # Diagnóstico del propio monitor (solo con la instrumentación activa)
+        self.widgets["diag_frame"] = tk.LabelFrame(scrollable_frame, text="🩺 Diagnóstico", 
+                                                  bg="#0d1117", fg="#f0f6fc", font=("Segoe UI", 12, "bold"))
+        self.widgets["diagnostics"] = tk.Label(self.widgets["diag_frame"], font=("Courier", 9), 
+                                              bg="#0d1117", fg="#8b949e", justify="left")
+        self.widgets["diagnostics"].pack(pady=2, anchor="w", padx=5)
         
         # Controles
-        controls_frame = tk.Frame(scrollable_frame, bg="#0d1117")
+        self.widgets["controls_frame"] = controls_frame = tk.Frame(scrollable_frame, bg="#0d1117")
         controls_frame.pack(fill="x", padx=20, pady=10)
         
         refresh_btn = tk.Button(controls_frame, text="🔄 Actualizar", 
@@ -327,67 +578,177 @@ Estado: {status}"""
         # Pack canvas y scrollbar
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
+    
+    def set_widget(self, key, widget, **options):
+        """Reconfigura un widget solo si sus opciones cambiaron desde el último pintado"""
+        if self.rendered.get(key) != options:
+            widget.configure(**options)
+            self.rendered[key] = options
+    
+    def set_section_visible(self, key, frame, visible):
+        """Muestra u oculta una sección manteniendo el orden de la ventana"""
+        if self.rendered.get(key) == visible:
+            return
+        if visible:
+            frame.pack(fill="x", padx=20, pady=5, before=self.widgets["controls_frame"])
+        else:
+            frame.pack_forget()
+        self.rendered[key] = visible
+    
+    def update_window(self, stats):
+        """Actualiza en el sitio solo los valores que cambiaron"""
+        cpu, ram, disk, battery, status, temps, network = stats
+        values = self.sampler.snapshot().values
+        processes = values.get("processes", {})
+        diagnostics = values.get("diagnostics")
         
-        # Auto-refresh si está habilitado
-        #if self.config["auto_refresh"]:
-        #    self.window.after(self.config["refresh_interval"], self.auto_refresh)
+        health_status, health_color = self.get_health_status(cpu, ram, disk, battery)
+        self.set_widget("health", self.widgets["health"], text=health_status, fg=health_color)
+        self.set_widget("updated", self.widgets["updated"], 
+                        text=f"Actualizado: {datetime.now().strftime('%H:%M:%S')}")
         
-        # Guardar estadísticas al historial
-        self.save_to_history(stats)
+        for metric, value in zip(self.metric_widgets, (cpu, ram, disk, battery)):
+            self.update_metric_widget(metric, value)
         
-        self.window.mainloop()
+        # Información adicional
+        self.set_section_visible("battery_visible", self.widgets["battery_frame"], 
+                                 status != "🖥️ PC de Escritorio")
+        self.set_widget("battery_status", self.widgets["battery_status"], text=f"Estado Batería: {status}")
+        
+        # Temperaturas (si están disponibles)
+        self.set_section_visible("temp_visible", self.widgets["temp_frame"], bool(temps))
+        for sensor, temp in temps.items():
+            label = self.temp_labels.get(sensor)
+            if label is None:
+                label = tk.Label(self.widgets["temp_frame"], font=("Segoe UI", 10), bg="#0d1117")
+                label.pack(pady=2)
+                self.temp_labels[sensor] = label
+            color = "#4caf50" if temp < 70 else "#ff9800" if temp < 80 else "#f44336"
+            self.set_widget(f"temp:{sensor}", label, text=f"{sensor}: {temp}°C", fg=color)
+        
+        # Red (si está disponible)
+        self.set_section_visible("net_visible", self.widgets["net_frame"], bool(network))
+        net_texts = {
+            "bytes_sent": "Enviado", 
+            "bytes_recv": "Recibido",
+            "upload_speed": "Velocidad subida",
+            "download_speed": "Velocidad bajada",
+            "latency": "Latencia",
+            "status": "Estado"
+        }
+        for key, title in net_texts.items():
+            options = {"text": f"{title}: {network.get(key, 'N/A')}"}
+            if key == "status":
+                options["fg"] = "#4caf50" if network.get('status') == "Buena conexión" else "#ff9800"
+            self.set_widget(f"net:{key}", self.net_labels[key], **options)
+        
+        # Estadísticas por destino de la ventana del prober
+        lines = []
+        for target, summary in network.get("targets", {}).items():
+            if summary["median"] is None:
+                lines.append(f"{target}: sin respuesta")
+            else:
+                lines.append(f"{target}: mín {summary['min']:.0f} · med {summary['median']:.0f} · "
+                             f"p99 {summary['p99']:.0f} ms · pérdida {summary['loss']:.0%}")
+        self.set_widget("net:targets", self.net_labels["targets"], text="\n".join(lines))
+        
+        # Top procesos por CPU y por memoria
+        self.set_section_visible("proc_visible", self.widgets["proc_frame"], bool(processes.get("cpu")))
+        lines = ["CPU:"]
+        lines += [f"  {p['cpu']:>5.1f}%  {p['name'][:24]} ({p['pid']})" for p in processes.get("cpu", [])]
+        lines.append("Memoria:")
+        lines += [f"  {self.format_bytes(p['rss']):>9}  {p['name'][:24]} ({p['pid']})" 
+                  for p in processes.get("rss", [])]
+        self.set_widget("processes", self.widgets["processes"], text="\n".join(lines))
+        
+        # Diagnóstico: llamadas, p50/p99/máx por paso y consumo propio
+        self.set_section_visible("diag_visible", self.widgets["diag_frame"], bool(diagnostics))
+        if diagnostics:
+            usage = diagnostics["self"]
+            lines = [f"Monitor: CPU {usage['cpu_percent']}% | RSS {self.format_bytes(usage['rss'])} | "
+                     f"{usage['threads']} hilos",
+                     f"{'paso':<26}{'n':>6}{'p50':>9}{'p99':>9}{'máx':>9}"]
+            for name, timing in diagnostics["timings"].items():
+                if timing["count"]:
+                    lines.append(f"{name:<26}{timing['count']:>6}"
+                                 f"{timing['p50'] * 1000:>7.2f}ms{timing['p99'] * 1000:>7.2f}ms"
+                                 f"{timing['max'] * 1000:>7.2f}ms")
+            self.set_widget("diagnostics", self.widgets["diagnostics"], text="\n".join(lines))
     
     def setup_styles(self):
         """Configurar estilos de tkinter una sola vez"""
         self.style = ttk.Style()
         self.style.theme_use('clam')
     
-    def create_metric_widget(self, parent, name, value, color, icon, index):
-        """Crea widget individual para cada métrica"""
+    def create_metric_widget(self, parent, name, color, icon, index):
+        """Crea widget individual para cada métrica y devuelve sus referencias"""
         frame = tk.Frame(parent, bg="#161b22", relief="raised", bd=1)
         frame.pack(fill="x", pady=5)
         
         header_frame = tk.Frame(frame, bg="#161b22")
         header_frame.pack(fill="x", padx=10, pady=5)
         
-        tk.Label(header_frame, text=f"{icon} {name}: {value}%", 
-                font=("Segoe UI", 12, "bold"), bg="#161b22", fg="#f0f6fc").pack(anchor="w")
+        label = tk.Label(header_frame, font=("Segoe UI", 12, "bold"), bg="#161b22", fg="#f0f6fc")
+        label.pack(anchor="w")
         
         # Crear canvas personalizado para la barra de progreso
         canvas = tk.Canvas(frame, height=25, bg="#161b22", highlightthickness=0)
         canvas.pack(fill="x", padx=10, pady=(0, 10))
         
-        def draw_progress_bar():
-            canvas.delete("all")
-            canvas_width = canvas.winfo_width()
-            if canvas_width > 1:  # Solo dibujar si el canvas tiene tamaño
-                # Fondo de la barra
-                canvas.create_rectangle(5, 5, canvas_width-5, 20, 
-                                      fill="#21262d", outline="#30363d", width=1)
-                
-                # Barra de progreso
-                progress_width = int((canvas_width - 10) * (value / 100))
-                if progress_width > 0:
-                    canvas.create_rectangle(5, 5, 5 + progress_width, 20, 
-                                          fill=color, outline="", width=0)
-                
-                # Texto del porcentaje
-                canvas.create_text(canvas_width//2, 12, text=f"{value}%", 
-                                 fill="white", font=("Segoe UI", 9, "bold"))
-        
-        # Configurar el dibujo cuando el canvas esté listo
-        canvas.bind('<Configure>', lambda e: draw_progress_bar())
-        canvas.after(1, draw_progress_bar)  # Dibujar inicial
+        # Elementos creados una vez; después solo se mueven o se cambia su texto
+        metric = {
+            "name": name,
+            "icon": icon,
+            "label": label,
+            "canvas": canvas,
+            "background": canvas.create_rectangle(5, 5, 5, 20, fill="#21262d", outline="#30363d", width=1),
+            "bar": canvas.create_rectangle(5, 5, 5, 20, fill=color, outline="", width=0),
+            "text": canvas.create_text(0, 12, text="", fill="white", font=("Segoe UI", 9, "bold")),
+            "value": None,
+            "width": 0,
+        }
+        
+        # Recolocar la barra cuando cambie el tamaño del canvas
+        canvas.bind('<Configure>', lambda e: self.layout_progress_bar(metric, e.width))
+        return metric
+    
+    def layout_progress_bar(self, metric, canvas_width):
+        """Ajusta las coordenadas de la barra al ancho del canvas"""
+        metric["width"] = canvas_width
+        if canvas_width <= 1 or metric["value"] is None:  # Solo dibujar si el canvas tiene tamaño
+            return
+        canvas = metric["canvas"]
+        canvas.coords(metric["background"], 5, 5, canvas_width - 5, 20)
+        progress_width = max(0, int((canvas_width - 10) * (metric["value"] / 100)))
+        canvas.coords(metric["bar"], 5, 5, 5 + progress_width, 20)
+        canvas.coords(metric["text"], canvas_width // 2, 12)
+    
+    def update_metric_widget(self, metric, value):
+        """Actualiza etiqueta y barra solo si el valor cambió"""
+        if metric["value"] == value:
+            return
+        metric["value"] = value
+        metric["label"].configure(text=f"{metric['icon']} {metric['name']}: {value}%")
+        metric["canvas"].itemconfigure(metric["text"], text=f"{value}%")
+        self.layout_progress_bar(metric, metric["width"])
     
     def refresh_data(self):
-        """Actualizar datos manualmente"""
-        self.window.destroy()
-        self.run()
+        """Actualizar datos desde la última instantánea sin reconstruir la ventana"""
+        snapshot = self.sampler.snapshot()
+        if snapshot.seq == self.rendered.get("seq"):
+            return
+        self.rendered["seq"] = snapshot.seq
+        stats = self.stats_from_snapshot(snapshot)
+        with self.instruments.timed("render.update_window"):
+            self.update_window(stats)
+        with self.instruments.timed("history.save"):
+            self.save_to_history(stats)
     
     def auto_refresh(self):
         """Auto-actualización de datos"""
         if hasattr(self, 'window') and self.window.winfo_exists():
             self.refresh_data()
+            self.window.after(self.config["refresh_interval"], self.auto_refresh)
     
     def open_settings(self):
         """Abrir ventana de configuración"""
@@ -400,15 +761,34 @@ Estado: {status}"""
         tk.Label(settings_window, text="Configuración próximamente...", 
                 font=("Segoe UI", 14), bg="#0d1117", fg="#f0f6fc").pack(expand=True)
     
+    def query(self, metric, start, end, agg="p95", bucket="5m"):
+        """Agregado de una métrica por intervalos entre start y end"""
+        return history_query.query(self.history, metric, start, end, agg=agg, bucket=bucket)
+
     def show_history(self):
-        """Mostrar historial básico"""
+        """Mostrar historial con gráfico de las últimas 24 horas"""
         history_window = tk.Toplevel(self.window)
         history_window.title("📊 Historial")
-        history_window.geometry("500x400")
+        history_window.geometry("500x600")
         history_window.configure(bg="#0d1117")
         
         if self.history:
-            latest_entries = self.history[-10:]  # Últimos 10 registros
+            # Gráfico p95 de CPU y RAM en intervalos de 15 minutos
+            end = datetime.now()
+            start = end - timedelta(hours=24)
+            series = [
+                ("CPU p95", self.query("cpu", start, end, agg="p95", bucket="15m"), "#ff6b6b"),
+                ("RAM p95", self.query("ram", start, end, agg="p95", bucket="15m"), "#4ecdc4"),
+            ]
+            
+            tk.Label(history_window, text="Últimas 24 horas", 
+                    font=("Segoe UI", 12, "bold"), bg="#0d1117", fg="#f0f6fc").pack(pady=(10, 0))
+            chart = tk.Canvas(history_window, height=180, bg="#161b22", highlightthickness=0)
+            chart.pack(fill="x", padx=10, pady=5)
+            chart.bind('<Configure>', lambda e: self.draw_history_chart(
+                chart, series, start.timestamp(), end.timestamp()))
+            
+            latest_entries = self.history.latest(10)  # Últimos 10 registros
             
             text_widget = tk.Text(history_window, bg="#161b22", fg="#f0f6fc", 
                                 font=("Courier", 10))
@@ -417,7 +797,7 @@ Estado: {status}"""
             text_widget.insert(tk.END, "HISTORIAL RECIENTE:\n\n")
             
             for entry in latest_entries:
-                timestamp = datetime.fromisoformat(entry["timestamp"])
+                timestamp = datetime.fromtimestamp(entry["timestamp"])
                 text_widget.insert(tk.END, f"📅 {timestamp.strftime('%Y-%m-%d %H:%M:%S')}\n")
                 text_widget.insert(tk.END, f"CPU: {entry['cpu']}% | RAM: {entry['ram']}% | ")
                 text_widget.insert(tk.END, f"Disco: {entry['disk']}% | Batería: {entry['battery']}%\n\n")
@@ -427,6 +807,29 @@ Estado: {status}"""
             tk.Label(history_window, text="No hay historial disponible", 
                     font=("Segoe UI", 14), bg="#0d1117", fg="#f0f6fc").pack(expand=True)
     
+    def draw_history_chart(self, canvas, series, start, end):
+        """Dibuja las series (ya agregadas) como líneas sobre el canvas"""
+        canvas.delete("all")
+        width = canvas.winfo_width()
+        height = canvas.winfo_height()
+        if width <= 1 or end <= start:
+            return
+        
+        for y_value in (25, 50, 75):
+            y = height - 10 - (height - 20) * y_value / 100
+            canvas.create_line(0, y, width, y, fill="#30363d")
+        
+        for i, (label, points, color) in enumerate(series):
+            coords = []
+            for bucket_start, value in points:
+                x = (bucket_start - start) / (end - start) * width
+                y = height - 10 - (height - 20) * value / 100
+                coords.extend((max(0, x), y))
+            if len(coords) >= 4:
+                canvas.create_line(*coords, fill=color, width=2)
+            canvas.create_text(10, 10 + i * 15, text=label, fill=color, anchor="w",
+                             font=("Segoe UI", 9, "bold"))
+    
     def run(self):
         """Ejecutar el monitor"""
         stats = self.get_system_stats()
@@ -437,9 +840,228 @@ Estado: {status}"""
         # Crear ventana
         self.create_modern_window(stats)
 
+    def run_headless(self, host=None, port=None):
+        """Muestreo continuo sin ventana, sirviendo la última instantánea por HTTP"""
+        from metrics_server import MetricsCache, MetricsServer
+        
+        cache = MetricsCache()
+        self.sampler.add_listener(cache.update)
+        server = MetricsServer(
+            cache,
+            host or self.config["http_host"],
+            self.config["http_port"] if port is None else port
+        )
+        server.start()
+        host, port = server.address
+        print(f"Sirviendo métricas en http://{host}:{port}/metrics y /metrics.json")
+        
+        self.start_sampling()
+        try:
+            while True:
+                time.sleep(self.config["refresh_interval"] / 1000)
+                with self.instruments.timed("history.save"):
+                    self.save_to_history(self.stats_from_snapshot(self.sampler.snapshot()))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.stop()
+            self.sampler.stop()
+            self.latency_prober.stop()
+
+    def collect_once(self):
+        """Una sola lectura sin hilos ni esperas de 1 s (modo --once)"""
+        cpu_times = psutil.cpu_times()._asdict()
+        net = psutil.net_io_counters()
+        now = time.time()
+        
+        previous = self.load_once_cache()
+        if not previous or not 0 < now - previous["time"] <= self.config["once_cache_max_age"]:
+            # Sin delta reciente: una muestra corta en lugar de interval=1
+            previous = {"time": now, "cpu_times": cpu_times,
+                        "net": [net.bytes_sent, net.bytes_recv]}
+            time.sleep(self.config["once_min_interval"])
+            cpu_times = psutil.cpu_times()._asdict()
+            net = psutil.net_io_counters()
+            now = time.time()
+        self.save_once_cache({"time": now, "cpu_times": cpu_times, "net": [net.bytes_sent, net.bytes_recv]})
+        
+        elapsed = now - previous["time"]
+        cpu = self.cpu_percent_from_times(previous["cpu_times"], cpu_times)
+        network = {
+            "bytes_sent": self.format_bytes(net.bytes_sent),
+            "bytes_recv": self.format_bytes(net.bytes_recv),
+            "upload_speed": self.format_bytes(max(0, net.bytes_sent - previous["net"][0]) / elapsed) + "/s",
+            "download_speed": self.format_bytes(max(0, net.bytes_recv - previous["net"][1]) / elapsed) + "/s",
+        }
+        battery = self.collect_battery()
+        return (
+            cpu,
+            self.collect_ram()["ram"],
+            self.collect_disk()["disk"],
+            battery["battery"],
+            battery["battery_status"],
+            self.get_temperature(),
+            network,
+        )
+    
+    def cpu_percent_from_times(self, before, after):
+        """Porcentaje de CPU entre dos lecturas de psutil.cpu_times()"""
+        # guest y guest_nice ya están incluidos en user y nice
+        fields = [f for f in after if f not in ("guest", "guest_nice") and f in before]
+        total = sum(after[f] - before[f] for f in fields)
+        idle = sum(after[f] - before[f] for f in ("idle", "iowait") if f in fields)
+        if total <= 0:
+            return 0.0
+        return round(max(0.0, min(100.0, (total - idle) / total * 100)), 1)
+    
+    def load_once_cache(self):
+        """Lectura anterior del modo --once (si existe)"""
+        try:
+            with open(self.once_cache_file, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def save_once_cache(self, data):
+        try:
+            with open(self.once_cache_file, 'w') as f:
+                json.dump(data, f)
+        except OSError:
+            pass
+    
+    def run_once(self, output_format="text"):
+        """Imprime una lectura y termina (para cron o el prompt de la shell)"""
+        stats = self.collect_once()
+        cpu, ram, disk, battery, status, temps, network = stats
+        health_status, _ = self.get_health_status(cpu, ram, disk, battery)
+        
+        if output_format == "json":
+            print(json.dumps({
+                "timestamp": datetime.now().isoformat(),
+                "health": health_status,
+                "cpu": cpu,
+                "ram": ram,
+                "disk": disk,
+                "battery": battery,
+                "battery_status": status,
+                "temps": temps,
+                "network": network,
+            }, ensure_ascii=False))
+        else:
+            print(f"Estado: {health_status}")
+            print(f"CPU: {cpu}% | RAM: {ram}% | Disco: {disk}% | Batería: {battery}% ({status})")
+            if temps:
+                print("Temperaturas: " + ", ".join(f"{name} {temp}°C" for name, temp in temps.items()))
+            print(f"Red: ↑ {network['upload_speed']} ↓ {network['download_speed']} "
+                  f"(enviado {network['bytes_sent']}, recibido {network['bytes_recv']})")
+
+    def run_agent(self, address):
+        """Muestreo local enviando lotes compactos a un colector remoto"""
+        from fleet import FleetAgent
+        
+        agent = FleetAgent(
+            address,
+            batch_size=self.config["fleet_batch_size"],
+            flush_interval=self.config["fleet_flush_interval"],
+            buffer_limit=self.config["fleet_buffer_limit"]
+        )
+        print(f"Enviando muestras de {agent.host} a {address[0]}:{address[1]}")
+        
+        self.start_sampling()
+        try:
+            while True:
+                time.sleep(self.config["refresh_interval"] / 1000)
+                snapshot = self.sampler.snapshot()
+                stats = self.stats_from_snapshot(snapshot)
+                agent.add((snapshot.timestamp, *stats[:5]))
+                self.save_to_history(stats)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            agent.flush()
+            agent.close()
+            self.sampler.stop()
+            self.latency_prober.stop()
+
+
+def run_collector(address, history_capacity):
+    """Colector de la flota: recibe muestras de los agentes y responde consultas"""
+    from fleet import FleetCollector
+    
+    collector = FleetCollector(*address, history_capacity=history_capacity)
+    collector.start()
+    host, port = collector.address
+    print(f"Colector escuchando en {host}:{port}")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        collector.stop()
+
+
+def run_fleet_query(address, condition):
+    """Imprime los hosts que cumplen una condición, p. ej. 'disk>90'"""
+    from fleet import fleet_request, parse_query
+    
+    if condition:
+        reply = fleet_request(address, {"type": "query", **parse_query(condition)})
+        for host, value in reply.get("hosts", []):
+            print(f"{host}: {value}")
+    else:
+        reply = fleet_request(address, {"type": "hosts"})
+        for host, sample in reply.get("hosts", {}).items():
+            print(f"{host}: CPU {sample['cpu']}% | RAM {sample['ram']}% | "
+                  f"Disco {sample['disk']}% | Batería {sample['battery']}%")
+    if "error" in reply:
+        print(f"Error: {reply['error']}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Monitor de salud del portátil")
+    parser.add_argument("--headless", action="store_true",
+                        help="sin ventana: sirve las métricas por HTTP")
+    parser.add_argument("--host", help="dirección del endpoint HTTP (modo --headless)")
+    parser.add_argument("--port", type=int, help="puerto del endpoint HTTP (modo --headless)")
+    parser.add_argument("--agent", metavar="HOST:PUERTO",
+                        help="sin ventana: envía las muestras al colector de la flota")
+    parser.add_argument("--collector", metavar="HOST:PUERTO", nargs="?", const="127.0.0.1:9110",
+                        help="ejecuta el colector de la flota")
+    parser.add_argument("--fleet-query", metavar="CONDICIÓN", nargs="?", const="",
+                        help="consulta al colector (--collector) hosts que cumplan p. ej. 'disk>90'")
+    parser.add_argument("--diagnostics", action="store_true",
+                        help="mide el tiempo de cada colector y paso de pintado")
+    parser.add_argument("--once", action="store_true",
+                        help="imprime una lectura y termina, sin ventana ni hilos")
+    parser.add_argument("--format", choices=["json", "text"], default="text",
+                        help="formato de salida de --once")
+    return parser.parse_args()
+
 # -------------------------------
 # Ejecutar
 # -------------------------------
 if __name__ == "__main__":
-    monitor = LaptopHealthMonitor()
-    monitor.run()
\ No newline at end of file
+    args = parse_args()
+    if args.once:
+        LaptopHealthMonitor(one_shot=True).run_once(args.format)
+        raise SystemExit(0)
+    if args.collector or args.fleet_query is not None:
+        from fleet import parse_address
+        
+        config = LaptopHealthMonitor(one_shot=True).config
+        address = parse_address(args.collector or "127.0.0.1:9110")
+        if args.fleet_query is not None:
+            run_fleet_query(address, args.fleet_query)
+        else:
+            run_collector(address, config["fleet_history_capacity"])
+        raise SystemExit(0)
+    monitor = LaptopHealthMonitor(diagnostics=args.diagnostics)
+    if args.agent:
+        from fleet import parse_address
+        
+        monitor.run_agent(parse_address(args.agent))
+    elif args.headless:
+        monitor.run_headless(args.host, args.port)
+    else:
+        monitor.run()
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+from history_query import percentile
+
+
+def parse_target(target):
+    """Acepta 'host:puerto' o una tupla (host, puerto)"""
+    if isinstance(target, str):
+        host, _, port = target.rpartition(":")
+        return host.strip("[]"), int(port)
+    host, port = target
+    return host, int(port)
+
+
+class RollingStats:
+    """Ventana fija de las últimas mediciones (None = paquete perdido)"""
+
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+
+    def add(self, latency_ms):
+        self.samples.append(latency_ms)
+
+    def summary(self):
+        """min, mediana, p99 y pérdida de la ventana actual"""
+        received = sorted(s for s in self.samples if s is not None)
+        total = len(self.samples)
+        return {
+            "count": total,
+            "last": self.samples[-1] if total else None,
+            "min": received[0] if received else None,
+            "median": percentile(received, 50),
+            "p99": percentile(received, 99),
+            "loss": round(1 - len(received) / total, 3) if total else None,
+        }
+
+
+class LatencyProber:
+    """Mide varios destinos a la vez con asyncio, a intervalos fijos"""
+
+    def __init__(self, targets, interval=10, timeout=2, window=60):
+        self.targets = [parse_target(t) for t in targets]
+        self.interval = interval
+        self.timeout = timeout
+        self._stats = {self.target_name(t): RollingStats(window) for t in self.targets}
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._stop_event = None
+
+    @staticmethod
+    def target_name(target):
+        host, port = target
+        return f"{host}:{port}"
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        """Arranca el bucle asyncio en un hilo propio"""
+        if self._thread:
+            return
+        self._loop = asyncio.new_event_loop()
+        self._stop_event = asyncio.Event()
+        self._thread = threading.Thread(target=self._run_loop, name="latency-prober", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2):
+        if not self._thread:
+            return
+        self._loop.call_soon_threadsafe(self._stop_event.set)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self):
+        """Resumen por destino (copia, segura entre hilos)"""
+        with self._lock:
+            return {name: rolling.summary() for name, rolling in self._stats.items()}
+
+    def probe_round(self):
+        """Una ronda síncrona sobre todos los destinos (sin hilo de fondo)"""
+        return asyncio.run(self._probe_all())
+
+    async def _probe(self, target):
+        start = time.perf_counter()
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(*target), self.timeout)
+        except (OSError, asyncio.TimeoutError):
+            return None
+        latency = round((time.perf_counter() - start) * 1000, 2)
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return latency
+
+    async def _probe_all(self):
+        results = await asyncio.gather(*(self._probe(t) for t in self.targets))
+        with self._lock:
+            for target, latency in zip(self.targets, results):
+                self._stats[self.target_name(target)].add(latency)
+        return dict(zip((self.target_name(t) for t in self.targets), results))
+
+    async def _main(self):
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            await self._probe_all()
+            delay = max(0.0, self.interval - (time.monotonic() - started))
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._main())
+        finally:
+            self._loop.close()
@@ -0,0 +1,182 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+JSON_CONTENT_TYPE = "application/json; charset=utf-8"
+METRICS_PATHS = ("/metrics", "/metrics.json")
+
+# (nombre, tipo, ayuda, clave en la instantánea)
+GAUGES = [
+    ("laptop_health_cpu_percent", "gauge", "Uso de CPU", "cpu"),
+    ("laptop_health_ram_percent", "gauge", "Uso de memoria RAM", "ram"),
+    ("laptop_health_disk_percent", "gauge", "Uso de disco", "disk"),
+    ("laptop_health_battery_percent", "gauge", "Carga de batería", "battery"),
+]
+
+NETWORK_METRICS = [
+    ("laptop_health_network_sent_bytes_total", "counter", "Bytes enviados", "bytes_sent_total"),
+    ("laptop_health_network_received_bytes_total", "counter", "Bytes recibidos", "bytes_recv_total"),
+    ("laptop_health_network_upload_bytes_per_second", "gauge", "Velocidad de subida", "upload_bps"),
+    ("laptop_health_network_download_bytes_per_second", "gauge", "Velocidad de bajada", "download_bps"),
+]
+
+
+def escape_label(value):
+    """Escapa un valor de etiqueta según el formato de texto de Prometheus"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_prometheus(snapshot):
+    """Formato de texto de Prometheus para una instantánea"""
+    values = snapshot.values
+    lines = []
+
+    def add(name, kind, help_text, samples):
+        if not samples:
+            return
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{name}{labels} {value}")
+
+    for name, kind, help_text, key in GAUGES:
+        if key in values:
+            add(name, kind, help_text, [("", values[key])])
+
+    if "battery_status" in values:
+        add("laptop_health_battery_info", "gauge", "Estado de la batería",
+            [(f'{{status="{escape_label(values["battery_status"])}"}}', 1)])
+
+    temps = values.get("temps", {})
+    add("laptop_health_temperature_celsius", "gauge", "Temperatura media por sensor",
+        [(f'{{sensor="{escape_label(sensor)}"}}', temp) for sensor, temp in temps.items()])
+
+    net_io = values.get("net_io", {})
+    for name, kind, help_text, key in NETWORK_METRICS:
+        if net_io.get(key) is not None:
+            add(name, kind, help_text, [("", net_io[key])])
+
+    latency = values.get("latency", {})
+    if latency.get("latency_ms") is not None:
+        add("laptop_health_latency_milliseconds", "gauge", "Latencia TCP",
+            [("", latency["latency_ms"])])
+
+    targets = latency.get("targets", {})
+    add("laptop_health_latency_target_milliseconds", "gauge", "Latencia por destino en la ventana móvil",
+        [(f'{{target="{escape_label(target)}",stat="{stat}"}}', summary[stat])
+         for target, summary in targets.items()
+         for stat in ("min", "median", "p99") if summary[stat] is not None])
+    add("laptop_health_latency_loss_ratio", "gauge", "Fracción de sondas sin respuesta",
+        [(f'{{target="{escape_label(target)}"}}', summary["loss"])
+         for target, summary in targets.items() if summary["loss"] is not None])
+
+    processes = values.get("processes", {})
+    add("laptop_health_top_process_cpu_percent", "gauge", "Procesos con más uso de CPU",
+        [(f'{{pid="{p["pid"]}",name="{escape_label(p["name"])}"}}', p["cpu"])
+         for p in processes.get("cpu", [])])
+    add("laptop_health_top_process_rss_bytes", "gauge", "Procesos con más memoria residente",
+        [(f'{{pid="{p["pid"]}",name="{escape_label(p["name"])}"}}', p["rss"])
+         for p in processes.get("rss", [])])
+    add("laptop_health_top_process_io_bytes_per_second", "gauge", "Procesos con más E/S de disco",
+        [(f'{{pid="{p["pid"]}",name="{escape_label(p["name"])}"}}', p["io"])
+         for p in processes.get("io", [])])
+
+    add("laptop_health_alert_active", "gauge", "Reglas de alerta activas",
+        [(f'{{rule="{escape_label(alert["name"])}"}}', 1) for alert in values.get("alerts", [])])
+
+    diagnostics = values.get("diagnostics")
+    if diagnostics:
+        timings = diagnostics["timings"]
+        add("laptop_health_step_calls_total", "counter", "Llamadas por colector o paso de pintado",
+            [(f'{{step="{escape_label(step)}"}}', t["count"]) for step, t in timings.items()])
+        add("laptop_health_step_duration_seconds", "gauge", "Duración por colector o paso (cuantiles)",
+            [(f'{{step="{escape_label(step)}",quantile="{q}"}}', t[key])
+             for step, t in timings.items() if t["count"]
+             for q, key in (("0.5", "p50"), ("0.99", "p99"), ("1", "max"))])
+        add("laptop_health_self_cpu_percent", "gauge", "CPU usada por el propio monitor",
+            [("", diagnostics["self"]["cpu_percent"])])
+        add("laptop_health_self_rss_bytes", "gauge", "Memoria residente del propio monitor",
+            [("", diagnostics["self"]["rss"])])
+
+    lines.append("# HELP laptop_health_snapshot_timestamp_seconds Momento de la última muestra")
+    lines.append("# TYPE laptop_health_snapshot_timestamp_seconds gauge")
+    lines.append(f"laptop_health_snapshot_timestamp_seconds {snapshot.timestamp}")
+    return "\n".join(lines) + "\n"
+
+
+def render_json(snapshot):
+    """Instantánea completa como JSON"""
+    return json.dumps(
+        {"seq": snapshot.seq, "timestamp": snapshot.timestamp, **snapshot.values},
+        ensure_ascii=False
+    )
+
+
+class MetricsCache:
+    """Respuestas ya serializadas, reconstruidas una vez por muestra"""
+
+    def __init__(self):
+        self._responses = {}
+
+    def update(self, snapshot):
+        """Serializa la instantánea para todas las rutas (se llama al publicar)"""
+        prometheus = render_prometheus(snapshot).encode("utf-8")
+        as_json = render_json(snapshot).encode("utf-8")
+        # Sustitución atómica del diccionario: los lectores nunca ven un estado a medias
+        self._responses = {
+            "/metrics": (PROMETHEUS_CONTENT_TYPE, prometheus),
+            "/metrics.json": (JSON_CONTENT_TYPE, as_json),
+        }
+
+    def get(self, path):
+        return self._responses.get(path)
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Sirve las respuestas cacheadas sin tocar psutil"""
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path not in METRICS_PATHS:
+            self.send_error(404)
+            return
+        response = self.server.cache.get(path)
+        if response is None:
+            # Aún no hay ninguna muestra
+            self.send_error(503)
+            return
+        content_type, body = response
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Sin una línea por petición: los scrapers consultan con frecuencia
+        pass
+
+
+class MetricsServer:
+    """Servidor HTTP local en un hilo propio"""
+
+    def __init__(self, cache, host="127.0.0.1", port=9108):
+        self.httpd = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.cache = cache
+        self._thread = None
+
+    @property
+    def address(self):
+        return self.httpd.server_address[:2]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-server", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread:
+            self._thread.join()
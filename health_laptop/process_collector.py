@@ -0,0 +1,114 @@
+import heapq
+import time
+
+import psutil
+
+
+class _TrackedProcess:
+    """Proceso en caché entre muestras, con los datos necesarios para los deltas"""
+
+    __slots__ = ("proc", "name", "create_time", "io_total", "io_time", "io_denied")
+
+    def __init__(self, proc, name, create_time):
+        self.proc = proc
+        self.name = name
+        self.create_time = create_time
+        self.io_total = None
+        self.io_time = None
+        self.io_denied = False
+
+
+class ProcessCollector:
+    """Top-N de procesos por CPU, memoria (RSS) e E/S sin dormir entre lecturas"""
+
+    def __init__(self, top_n=5):
+        self.top_n = top_n
+        self._tracked = {}
+
+    def collect(self):
+        """Lee cada proceso una vez (oneshot) y devuelve los top-N de cada métrica"""
+        pids = set(psutil.pids())
+        for pid in self._tracked.keys() - pids:
+            del self._tracked[pid]
+        for pid in pids - self._tracked.keys():
+            self._track(pid)
+
+        now = time.monotonic()
+        top_cpu, top_rss, top_io = [], [], []
+        gone = []
+        for pid, tracked in self._tracked.items():
+            proc = tracked.proc
+            try:
+                with proc.oneshot():
+                    if proc.create_time() != tracked.create_time:
+                        # PID reutilizado por otro proceso
+                        gone.append(pid)
+                        continue
+                    cpu = proc.cpu_percent(interval=None)
+                    rss = proc.memory_info().rss
+                    io_rate = self._io_rate(tracked, now)
+            except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                gone.append(pid)
+                continue
+            except psutil.AccessDenied:
+                continue
+
+            row = (pid, tracked.name, cpu, rss, io_rate)
+            # Montículos acotados a top_n: O(P log N) en una sola pasada
+            self._push(top_cpu, cpu, row)
+            self._push(top_rss, rss, row)
+            if io_rate:
+                self._push(top_io, io_rate, row)
+
+        for pid in gone:
+            del self._tracked[pid]
+
+        return {"processes": {
+            "count": len(self._tracked),
+            "cpu": self._rows(top_cpu),
+            "rss": self._rows(top_rss),
+            "io": self._rows(top_io),
+        }}
+
+    def _track(self, pid):
+        try:
+            proc = psutil.Process(pid)
+            with proc.oneshot():
+                tracked = _TrackedProcess(proc, proc.name(), proc.create_time())
+                # Primera llamada: fija la referencia para el siguiente delta
+                proc.cpu_percent(interval=None)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return
+        self._tracked[pid] = tracked
+
+    def _io_rate(self, tracked, now):
+        """Bytes/s leídos+escritos desde la muestra anterior"""
+        if tracked.io_denied:
+            return None
+        try:
+            io = tracked.proc.io_counters()
+        except (psutil.AccessDenied, AttributeError, NotImplementedError):
+            # Sin permiso o no soportado: no se vuelve a intentar
+            tracked.io_denied = True
+            return None
+        total = io.read_bytes + io.write_bytes
+        rate = None
+        if tracked.io_total is not None and now > tracked.io_time:
+            rate = (total - tracked.io_total) / (now - tracked.io_time)
+        tracked.io_total = total
+        tracked.io_time = now
+        return rate
+
+    def _push(self, heap, key, row):
+        item = (key, row[0], row)
+        if len(heap) < self.top_n:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+
+    def _rows(self, heap):
+        return [
+            {"pid": pid, "name": name, "cpu": round(cpu, 1), "rss": rss,
+             "io": round(io_rate, 1) if io_rate is not None else None}
+            for _, _, (pid, name, cpu, rss, io_rate) in sorted(heap, reverse=True)
+        ]
@@ -0,0 +1,231 @@
+from array import array
+
+# Columnas numéricas: nombre y tipo de array (float32 / uint8)
+METRIC_COLUMNS = (("cpu", "f"), ("ram", "f"), ("disk", "f"), ("battery", "B"))
+
+
+class Rollup:
+    """Agregados min/avg/max por intervalo fijo, mantenidos de forma incremental"""
+
+    def __init__(self, width, capacity):
+        self.width = width  # segundos
+        self.capacity = capacity
+        self.starts = array('q')
+        self.counts = array('I')
+        self.columns = {
+            name: {"min": array('f'), "avg": array('f'), "max": array('f')}
+            for name, _ in METRIC_COLUMNS
+        }
+        self._head = 0
+        self._bucket = None
+        self._acc = None
+        self._count = 0
+
+    def __len__(self):
+        return len(self.starts) + (1 if self._bucket is not None else 0)
+
+    def add(self, timestamp_ms, values):
+        """Incorpora una muestra al intervalo en curso"""
+        bucket = timestamp_ms // (self.width * 1000)
+        if bucket != self._bucket:
+            self._close_bucket()
+            self._bucket = bucket
+            self._acc = {name: [v, v, v] for name, v in values.items()}
+            self._count = 1
+            return
+        for name, v in values.items():
+            acc = self._acc[name]
+            if v < acc[0]:
+                acc[0] = v
+            acc[1] += v
+            if v > acc[2]:
+                acc[2] = v
+        self._count += 1
+
+    def start_at(self, i):
+        """Inicio (segundos) del i-ésimo intervalo en orden cronológico"""
+        closed = len(self.starts)
+        if i < closed:
+            return self.starts[(self._head + i) % closed] * self.width
+        return self._bucket * self.width
+
+    def row(self, i):
+        """Intervalo i-ésimo como (inicio_s, n, {métrica: (min, avg, max)})"""
+        closed = len(self.starts)
+        if i < closed:
+            idx = (self._head + i) % closed
+            return (
+                self.starts[idx] * self.width,
+                self.counts[idx],
+                {name: (cols["min"][idx], cols["avg"][idx], cols["max"][idx])
+                 for name, cols in self.columns.items()},
+            )
+        return (
+            self._bucket * self.width,
+            self._count,
+            {name: (acc[0], acc[1] / self._count, acc[2]) for name, acc in self._acc.items()},
+        )
+
+    def rows(self):
+        """Intervalos en orden cronológico, incluido el que está en curso"""
+        for i in range(len(self)):
+            yield self.row(i)
+
+    def discard_older_than(self, timestamp_ms):
+        """Descarta los intervalos que empiezan antes de timestamp_ms
+
+        Un intervalo que contiene muestras descartadas ya no es exacto: se
+        quita entero y las consultas leen esas muestras del buffer.
+        """
+        closed = len(self.starts)
+        drop = 0
+        while drop < closed and self.start_at(drop) * 1000 < timestamp_ms:
+            drop += 1
+        if drop:
+            # Reordena cronológicamente y quita los más antiguos (es poco frecuente)
+            head = self._head
+            for column in (self.starts, self.counts,
+                           *(cols[kind] for cols in self.columns.values() for kind in cols)):
+                column[:] = column[head:] + column[:head]
+                del column[:drop]
+            self._head = 0
+        if drop == closed and self._bucket is not None and self._bucket * self.width * 1000 < timestamp_ms:
+            self._bucket = None
+            self._acc = None
+            self._count = 0
+
+    def _close_bucket(self):
+        if self._bucket is None:
+            return
+        if len(self.starts) < self.capacity:
+            self.starts.append(self._bucket)
+            self.counts.append(self._count)
+            for name, acc in self._acc.items():
+                cols = self.columns[name]
+                cols["min"].append(acc[0])
+                cols["avg"].append(acc[1] / self._count)
+                cols["max"].append(acc[2])
+        else:
+            # Sobrescribe el intervalo más antiguo
+            idx = self._head
+            self.starts[idx] = self._bucket
+            self.counts[idx] = self._count
+            for name, acc in self._acc.items():
+                cols = self.columns[name]
+                cols["min"][idx] = acc[0]
+                cols["avg"][idx] = acc[1] / self._count
+                cols["max"][idx] = acc[2]
+            self._head = (self._head + 1) % self.capacity
+
+
+class MetricRingBuffer:
+    """Historial en columnas compactas (int64/float32/uint8) con capacidad fija"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.timestamps = array('q')  # milisegundos desde epoch
+        self.columns = {name: array(code) for name, code in METRIC_COLUMNS}
+        self.status = array('B')
+        self._status_codes = {}
+        self._status_names = []
+        self._head = 0
+        self._size = 0
+        self.rollups = {
+            "1m": Rollup(60, capacity // 12 + 1),
+            "1h": Rollup(3600, capacity // 720 + 1),
+        }
+
+    def __len__(self):
+        return self._size
+
+    def __bool__(self):
+        return self._size > 0
+
+    def physical_index(self, i):
+        """Posición en los arrays del i-ésimo elemento lógico (0 = más antiguo)"""
+        return (self._head + i) % len(self.timestamps)
+
+    def timestamp_at(self, i):
+        return self.timestamps[self.physical_index(i)]
+
+    def status_code(self, status):
+        """Interna el texto del estado en un código pequeño"""
+        code = self._status_codes.get(status)
+        if code is not None:
+            return code
+        if len(self._status_names) < 255:
+            code = len(self._status_names)
+            self._status_codes[status] = code
+            self._status_names.append(status)
+            return code
+        # uint8 agotado: los estados nuevos comparten el último código
+        if len(self._status_names) == 255:
+            self._status_names.append("❓ Otro")
+        return 255
+
+    def append(self, timestamp, cpu, ram, disk, battery, status):
+        """Añade una muestra (timestamp en segundos) y actualiza los agregados"""
+        timestamp_ms = int(timestamp * 1000)
+        values = {"cpu": cpu, "ram": ram, "disk": disk, "battery": max(0, min(255, int(battery)))}
+        code = self.status_code(status)
+
+        if len(self.timestamps) < self.capacity:
+            self.timestamps.append(timestamp_ms)
+            for name, value in values.items():
+                self.columns[name].append(value)
+            self.status.append(code)
+            self._size += 1
+        else:
+            idx = (self._head + self._size) % self.capacity
+            self.timestamps[idx] = timestamp_ms
+            for name, value in values.items():
+                self.columns[name][idx] = value
+            self.status[idx] = code
+            if self._size < self.capacity:
+                self._size += 1
+            else:
+                self._head = (self._head + 1) % self.capacity
+
+        for rollup in self.rollups.values():
+            rollup.add(timestamp_ms, values)
+
+    def discard_older_than(self, timestamp):
+        """Descarta por el principio las muestras anteriores a timestamp (segundos)"""
+        limit = int(timestamp * 1000)
+        while self._size and self.timestamps[self._head] < limit:
+            self._head = (self._head + 1) % len(self.timestamps)
+            self._size -= 1
+        for rollup in self.rollups.values():
+            rollup.discard_older_than(limit)
+        if not self._size:
+            # Vacío: vuelve a empezar desde el principio de los arrays
+            self._head = 0
+            del self.timestamps[:], self.status[:]
+            for column in self.columns.values():
+                del column[:]
+
+    def column_slice(self, name, lo, hi):
+        """Copia de la columna para los índices lógicos [lo, hi)"""
+        column = self.columns[name]
+        if lo >= hi:
+            return column[:0]
+        start = self.physical_index(lo)
+        end = start + (hi - lo)
+        if end <= len(column):
+            return column[start:end]
+        # El rango da la vuelta al final del buffer circular
+        return column[start:] + column[:end - len(column)]
+
+    def entry(self, i):
+        """Muestra i-ésima como diccionario (timestamp en segundos)"""
+        idx = self.physical_index(i)
+        entry = {"timestamp": self.timestamps[idx] / 1000}
+        for name, column in self.columns.items():
+            entry[name] = round(column[idx], 1) if column.typecode == 'f' else column[idx]
+        entry["battery_status"] = self._status_names[self.status[idx]]
+        return entry
+
+    def latest(self, n):
+        """Últimas n muestras, de la más antigua a la más reciente"""
+        start = max(0, self._size - n)
+        return [self.entry(i) for i in range(start, self._size)]
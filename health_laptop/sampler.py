@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+# Instantánea inmutable: los lectores solo copian una referencia
+Snapshot = namedtuple("Snapshot", ["seq", "timestamp", "values"])
+
+EMPTY_SNAPSHOT = Snapshot(0, 0.0, MappingProxyType({}))
+
+
+class Sampler:
+    """Ejecuta cada colector en su propio hilo y publica la última instantánea"""
+
+    def __init__(self):
+        self._collectors = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._pending = set()
+        self._ready = threading.Event()
+        self._snapshot = EMPTY_SNAPSHOT
+
+    def add_collector(self, name, func, interval):
+        """Registra un colector que devuelve un dict con sus métricas"""
+        if self._threads:
+            raise RuntimeError("No se pueden añadir colectores con el muestreo activo")
+        self._collectors[name] = (func, interval)
+
+    def add_listener(self, func):
+        """Registra una función que recibe cada nueva instantánea"""
+        self._listeners.append(func)
+
+    @property
+    def running(self):
+        return bool(self._threads)
+
+    def start(self):
+        """Arranca un hilo por colector"""
+        if self._threads:
+            return
+        self._stop_event.clear()
+        self._pending = set(self._collectors)
+        if not self._pending:
+            self._ready.set()
+        for name, (func, interval) in self._collectors.items():
+            thread = threading.Thread(
+                target=self._loop, args=(name, func, interval),
+                name=f"sampler-{name}", daemon=True
+            )
+            self._threads.append(thread)
+            thread.start()
+
+    def stop(self, timeout=2):
+        """Detiene los hilos de muestreo"""
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def wait_ready(self, timeout=None):
+        """Espera a que todos los colectores hayan publicado al menos una vez"""
+        return self._ready.wait(timeout)
+
+    def snapshot(self):
+        """Devuelve la última instantánea publicada (sin bloquear)"""
+        return self._snapshot
+
+    def _loop(self, name, func, interval):
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            try:
+                values = func()
+            except Exception as e:
+                print(f"Error en el colector {name}: {e}")
+                values = None
+            if values:
+                self._publish(values)
+            with self._lock:
+                self._pending.discard(name)
+                if not self._pending:
+                    self._ready.set()
+            elapsed = time.monotonic() - started
+            self._stop_event.wait(max(0.0, interval - elapsed))
+
+    def _publish(self, values):
+        with self._lock:
+            merged = dict(self._snapshot.values)
+            merged.update(values)
+            snapshot = Snapshot(self._snapshot.seq + 1, time.time(), MappingProxyType(merged))
+            self._snapshot = snapshot
+        for listener in self._listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                print(f"Error notificando instantánea: {e}")